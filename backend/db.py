@@ -1,10 +1,12 @@
 from __future__ import annotations
 
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, text
+from sqlalchemy import create_engine, event, Column, Integer, String, Float, DateTime, text
 from sqlalchemy.orm import declarative_base, sessionmaker
 from datetime import datetime
 import hashlib
+import hmac
 import os
+import threading
 
 
 # Choose DB URL based on environment.
@@ -17,9 +19,64 @@ DB_URL = os.environ.get("DATABASE_URL") or (
     VERCEL_DB_URL if os.environ.get("VERCEL") else DEFAULT_DB_URL
 )
 engine = create_engine(DB_URL, echo=False, future=True)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, _record):
+        # WAL lets readers proceed while a write is in progress and turns each
+        # commit into an append to the log; NORMAL sync is safe with WAL.
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.close()
+
+_SessionFactory = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 Base = declarative_base()
 
+# Schema creation/migration is deferred to the first session so that importing
+# the app (e.g. a serverless cold start) does not touch the database.
+_db_ready = False
+_db_lock = threading.Lock()
+
+
+def ensure_db() -> None:
+    """Run init_db() once per process."""
+    global _db_ready
+    if _db_ready:
+        return
+    with _db_lock:
+        if not _db_ready:
+            init_db()
+            _db_ready = True
+
+
+def SessionLocal():
+    ensure_db()
+    return _SessionFactory()
+
+
+# Password hashes are stored as "scrypt$<salt hex>$<digest hex>".
+_SCRYPT_PARAMS = {"n": 2**14, "r": 8, "p": 1, "dklen": 32}
+
+
+def hash_password(pw: str) -> str:
+    salt = os.urandom(16)
+    digest = hashlib.scrypt(pw.encode("utf-8"), salt=salt, **_SCRYPT_PARAMS)
+    return f"scrypt${salt.hex()}${digest.hex()}"
+
+
+def verify_password(pw: str, password_hash: str) -> bool:
+    if not password_hash.startswith("scrypt$"):
+        # Legacy rows store an unsalted SHA-256 hex digest
+        legacy = hashlib.sha256(pw.encode("utf-8")).hexdigest()
+        return hmac.compare_digest(password_hash, legacy)
+    try:
+        _, salt_hex, digest_hex = password_hash.split("$", 2)
+        digest = hashlib.scrypt(pw.encode("utf-8"), salt=bytes.fromhex(salt_hex), **_SCRYPT_PARAMS)
+    except ValueError:
+        return False
+    return hmac.compare_digest(digest.hex(), digest_hex)
+
 
 class User(Base):
     __tablename__ = "users"
@@ -30,7 +87,10 @@ class User(Base):
 
     @staticmethod
     def hash_pw(pw: str) -> str:
-        return hashlib.sha256(pw.encode("utf-8")).hexdigest()
+        return hash_password(pw)
+
+    def check_pw(self, pw: str) -> bool:
+        return verify_password(pw, self.password_hash or "")
 
 
 class Customer(Base):
@@ -56,55 +116,66 @@ class Product(Base):
     price = Column(Float, nullable=False, default=0.0)
 
 
+# Bump when adding a migration below; recorded in the schema_meta table
+SCHEMA_VERSION = 1
+
+# Customer columns added after the table was first created (SQLite allows ADD COLUMN)
+_CUSTOMER_ADDED_COLUMNS = [
+    ("address1", "TEXT"),
+    ("address2", "TEXT"),
+    ("city", "TEXT"),
+    ("state", "TEXT"),
+    ("postal_code", "TEXT"),
+    ("country_code", "TEXT"),
+    ("vat_number", "TEXT"),
+    ("vat_rate", "REAL"),
+    ("ar_account", "TEXT"),
+]
+
+
 def init_db():
     Base.metadata.create_all(bind=engine)
     # seed admin user if none exists
-    with SessionLocal() as db:
+    with _SessionFactory() as db:
         if not db.query(User).first():
             admin = User(username="admin", password_hash=User.hash_pw("admin"))
             db.add(admin)
             db.commit()
 
-    # Add new Customer columns if missing (SQLite allows ADD COLUMN)
-    with engine.connect() as conn:
+    # Run pending migrations in a single transaction; skipped once the schema is current
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS schema_meta (version INTEGER NOT NULL)"))
+        version = conn.execute(text("SELECT MAX(version) FROM schema_meta")).scalar() or 0
+        if version >= SCHEMA_VERSION:
+            return
         cols = conn.execute(text("PRAGMA table_info(customers)")).fetchall()
         existing = {c[1] for c in cols}
-        add_cols = []
-        if "address1" not in existing:
-            add_cols.append("ALTER TABLE customers ADD COLUMN address1 TEXT")
-        if "address2" not in existing:
-            add_cols.append("ALTER TABLE customers ADD COLUMN address2 TEXT")
-        if "city" not in existing:
-            add_cols.append("ALTER TABLE customers ADD COLUMN city TEXT")
-        if "state" not in existing:
-            add_cols.append("ALTER TABLE customers ADD COLUMN state TEXT")
-        if "postal_code" not in existing:
-            add_cols.append("ALTER TABLE customers ADD COLUMN postal_code TEXT")
-        if "country_code" not in existing:
-            add_cols.append("ALTER TABLE customers ADD COLUMN country_code TEXT")
-        if "vat_number" not in existing:
-            add_cols.append("ALTER TABLE customers ADD COLUMN vat_number TEXT")
-        if "vat_rate" not in existing:
-            add_cols.append("ALTER TABLE customers ADD COLUMN vat_rate REAL")
-        if "ar_account" not in existing:
-            add_cols.append("ALTER TABLE customers ADD COLUMN ar_account TEXT")
-        for sql in add_cols:
-            conn.execute(text(sql))
-            conn.commit()
+        for name, sqltype in _CUSTOMER_ADDED_COLUMNS:
+            if name not in existing:
+                conn.execute(text(f"ALTER TABLE customers ADD COLUMN {name} {sqltype}"))
+        conn.execute(text("DELETE FROM schema_meta"))
+        conn.execute(text("INSERT INTO schema_meta (version) VALUES (:v)"), {"v": SCHEMA_VERSION})
+
+
+# Default VAT rate by ISO country code
+_VAT_RATES: dict[str, float] = {
+    "US": 0.0,
+    "GB": 0.20,
+    "DE": 0.19,
+    "FR": 0.20,
+    "AE": 0.05,
+    "SA": 0.15,
+    "IN": 0.18,
+    "PK": 0.18,
+    "CA": 0.05,
+    "AU": 0.10,
+}
+
 
 def default_vat_rate(country_code: str | None) -> float:
-    mapping = {
-        "US": 0.0,
-        "GB": 0.20,
-        "DE": 0.19,
-        "FR": 0.20,
-        "AE": 0.05,
-        "SA": 0.15,
-        "IN": 0.18,
-        "PK": 0.18,
-        "CA": 0.05,
-        "AU": 0.10,
-    }
     if not country_code:
         return 0.0
-    return mapping.get(country_code.upper(), 0.0)
\ No newline at end of file
+    rate = _VAT_RATES.get(country_code)
+    if rate is None:
+        rate = _VAT_RATES.get(country_code.upper(), 0.0)
+    return rate
@@ -0,0 +1,53 @@
+"""HTTP validators (ETag / If-None-Match) for pages that rarely change."""
+
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+
+from fastapi import Request
+from fastapi.responses import Response
+
+# Browsers may keep the page but must revalidate it, so a redirect after a POST
+# never shows stale data; an unchanged page costs a 304 and no render.
+CACHE_CONTROL = "no-cache"
+
+
+def etag(body: bytes) -> str:
+    """Strong ETag for an exact response body."""
+    return '"' + hashlib.blake2s(body).hexdigest() + '"'
+
+
+def weak_etag(*parts: object) -> str:
+    """Weak ETag derived from whatever the response is rendered from (paths, file versions, params)."""
+    return 'W/"' + hashlib.blake2s(repr(parts).encode("utf-8")).hexdigest() + '"'
+
+
+def file_version(*paths: Path) -> tuple[tuple[int, int] | None, ...]:
+    """(mtime_ns, size) of each file, or None when it is missing."""
+    versions = []
+    for path in paths:
+        try:
+            st = path.stat()
+        except OSError:
+            versions.append(None)
+        else:
+            versions.append((st.st_mtime_ns, st.st_size))
+    return tuple(versions)
+
+
+def etag_matches(request: Request, tag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    opaque = tag.removeprefix("W/")
+    return any(t.strip().removeprefix("W/") in (opaque, "*") for t in header.split(","))
+
+
+def cache_headers(tag: str) -> dict[str, str]:
+    return {"ETag": tag, "Cache-Control": CACHE_CONTROL}
+
+
+def not_modified(tag: str) -> Response:
+    return Response(status_code=304, headers=cache_headers(tag))
@@ -0,0 +1,64 @@
+"""JSON encode/decode and atomic file writes for the file-backed stores.
+
+Uses orjson when it is installed and falls back to the stdlib otherwise.
+Both paths produce UTF-8; pretty output is 2-space indented, otherwise compact.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import stat
+import tempfile
+from pathlib import Path
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+# mkstemp creates files as 0600; new stores get the mode open() would have given them
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def loads(data: bytes | str) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any, pretty: bool = True) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+    if pretty:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def write_atomic(path: Path, data: bytes, fsync: bool = False) -> None:
+    """Replace path with data so readers see either the old or the new file, never a partial one.
+
+    With fsync=True the data is flushed to disk before the rename, so the new file
+    also survives a power loss intact.
+    """
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            os.fchmod(f.fileno(), mode)
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
@@ -1,33 +1,21 @@
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from .templating import templates_env
 from datetime import datetime
+from collections import defaultdict
+import asyncio
+import hashlib
+import heapq
+import hmac
+import importlib
 
 from .apps_registry import App, APPS
-from .modules.sales import router as sales_router
-from .modules.sales import load_invoices as load_sales_invoices, load_orders as load_sales_orders
-from .modules.zatca import router as zatca_router
-from .modules.catalogs import router as catalogs_router
-from .modules.accounting import router as accounting_router
-from .modules.finance import router as finance_router
-from .modules.purchases import router as purchases_router
-from .modules.purchases import load_bills as load_purchase_bills, load_orders as load_purchase_orders
-from .modules.inventory import router as inventory_router
-from .modules.inventory import compute_on_hand
-from .modules.settings import router as settings_router
-from .modules.production import router as production_router
-from .modules.mrp import router as mrp_router
-from .modules.employees import router as employees_router
-from .modules.time import router as time_router
-from .modules.hr import router as hr_router
-from .modules.auth import router as auth_router
-from .modules.banking import router as banking_router
-from .modules.chart import router as chart_router
-from .modules.quality import router as quality_router
-from .modules.slitting import router as slitting_router
-from .db import init_db
+from . import jsonio
+from .httpcache import etag as _etag, etag_matches as _etag_matches
+
+__all__ = ["app"]
 
 
 app = FastAPI(title="Matrix ERP")
@@ -44,18 +32,25 @@ app.add_middleware(
 # Static files (CSS, assets)
 app.mount("/static", StaticFiles(directory="backend/static"), name="static")
 
-# Jinja2 templates setup
-templates_env = Environment(
-    loader=FileSystemLoader("backend/templates"),
-    autoescape=select_autoescape(["html", "xml"]),
-)
+_TPL_INDEX = templates_env.get_template("index.html")
+_TPL_APP = templates_env.get_template("app.html")
+_dashboard_html: dict[str, tuple[bytes, str]] = {}
+_APPS_BY_SLUG: dict[str, App] = {a.slug: a for a in APPS}
 
 
 @app.get("/", response_class=HTMLResponse)
 async def dashboard(request: Request):
-    template = templates_env.get_template("index.html")
-    html = template.render(apps=APPS, request=request)
-    return HTMLResponse(content=html, status_code=200)
+    # index.html only reads request.url.path, so the render is reusable per path
+    path = request.url.path
+    cached = _dashboard_html.get(path)
+    if cached is None:
+        body = _TPL_INDEX.render(apps=APPS, request=request).encode("utf-8")
+        cached = _dashboard_html[path] = (body, _etag(body))
+    body, etag = cached
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(content=body, status_code=200, headers=headers)
 
 
 @app.get("/api/dashboard/data")
@@ -88,7 +83,8 @@ async def dashboard_data(from_date: str | None = None, to_date: str | None = Non
         # If no filters, everything is in range
         if start_dt is None and end_dt is None:
             return True
-        d = _parse_date(dstr)
+        # Stored dates are full ISO timestamps; compare on the date part
+        d = _parse_date((dstr or "")[:10])
         if d is None:
             # If we have filters but date is missing/unparseable, exclude
             return False
@@ -98,70 +94,52 @@ async def dashboard_data(from_date: str | None = None, to_date: str | None = Non
             return False
         return True
 
-    # --- Sales invoices status and monthly totals ---
-    invoices = []
-    try:
-        invoices = load_sales_invoices()
-    except Exception:
-        invoices = []
-    inv_status = {"open": 0, "paid": 0}
-    inv_months: dict[str, float] = {}
-    for i in invoices:
-        if _in_range(getattr(i, "date", None)):
-            inv_status[i.status] = inv_status.get(i.status, 0) + 1
-            month = (i.date or "")[:7]  # YYYY-MM
-            try:
-                total = float(i.total or 0)
-            except Exception:
-                total = 0.0
-            inv_months[month] = inv_months.get(month, 0.0) + total
+    from .modules.sales import load_invoices as load_sales_invoices, load_orders as load_sales_orders
+    from .modules.purchases import load_bills as load_purchase_bills, load_orders as load_purchase_orders
+    from .modules.inventory import compute_on_hand
 
-    sales_orders = []
-    try:
-        sales_orders = load_sales_orders()
-    except Exception:
-        sales_orders = []
-    orders_status = {"confirmed": 0, "delivered": 0, "invoiced": 0}
-    for o in sales_orders:
-        if _in_range(getattr(o, "date", None)):
-            orders_status[o.status] = orders_status.get(o.status, 0) + 1
-
-    # --- Purchases bills status and monthly totals ---
-    bills = []
-    try:
-        bills = load_purchase_bills()
-    except Exception:
-        bills = []
-    bills_status = {"open": 0, "paid": 0}
-    bills_months: dict[str, float] = {}
-    for b in bills:
-        if _in_range(getattr(b, "date", None)):
-            bills_status[b.status] = bills_status.get(b.status, 0) + 1
-            month = (b.date or "")[:7]
-            try:
-                total = float(b.total or 0)
-            except Exception:
-                total = 0.0
-            bills_months[month] = bills_months.get(month, 0.0) + total
+    filtered = start_dt is not None or end_dt is not None
 
-    # Purchases orders status
-    po_orders = []
-    try:
-        po_orders = load_purchase_orders()
-    except Exception:
-        po_orders = []
-    po_status = {"confirmed": 0, "billed": 0}
-    for o in po_orders:
-        if _in_range(getattr(o, "date", None)):
-            po_status[o.status] = po_status.get(o.status, 0) + 1
+    # The loaders are independent file reads + parses; run them concurrently
+    loaded = await asyncio.gather(
+        asyncio.to_thread(load_sales_invoices),
+        asyncio.to_thread(load_sales_orders),
+        asyncio.to_thread(load_purchase_bills),
+        asyncio.to_thread(load_purchase_orders),
+        asyncio.to_thread(compute_on_hand),
+        return_exceptions=True,
+    )
+    invoices, sales_orders, bills, po_orders, on_hand = (
+        None if isinstance(r, Exception) else r for r in loaded
+    )
+
+    def _tally(rows, statuses: tuple[str, ...], monthly: bool = False):
+        """Count rows per status and (optionally) sum totals per YYYY-MM in one pass."""
+        counts = dict.fromkeys(statuses, 0)
+        months: dict[str, float] = defaultdict(float)
+        for r in rows or []:
+            if filtered and not _in_range(getattr(r, "date", None)):
+                continue
+            counts[r.status] = counts.get(r.status, 0) + 1
+            if monthly:
+                try:
+                    total = float(r.total or 0)
+                except Exception:
+                    total = 0.0
+                months[(r.date or "")[:7]] += total  # YYYY-MM
+        return counts, months
+
+    # --- Sales invoices/orders and purchase bills/orders ---
+    inv_status, inv_months = _tally(invoices, ("open", "paid"), monthly=True)
+    orders_status, _ = _tally(sales_orders, ("confirmed", "delivered", "invoiced"))
+    bills_status, bills_months = _tally(bills, ("open", "paid"), monthly=True)
+    po_status, _ = _tally(po_orders, ("confirmed", "billed"))
 
     # --- Inventory top value by product ---
     inv_top = []
     try:
-        on_hand = compute_on_hand()
-        pairs = [(p, float(meta.get("value", 0.0))) for p, meta in on_hand.items()]
-        pairs.sort(key=lambda x: x[1], reverse=True)
-        inv_top = [{"product": p, "value": v} for p, v in pairs[:5]]
+        pairs = ((p, float(meta.get("value", 0.0))) for p, meta in on_hand.items())
+        inv_top = [{"product": p, "value": v} for p, v in heapq.nlargest(5, pairs, key=lambda x: x[1])]
     except Exception:
         inv_top = []
 
@@ -182,53 +160,84 @@ async def dashboard_data(from_date: str | None = None, to_date: str | None = Non
 
 @app.get("/app/{slug}", response_class=HTMLResponse)
 async def app_page(request: Request, slug: str):
-    app_item = next((a for a in APPS if a.slug == slug), None)
+    app_item = _APPS_BY_SLUG.get(slug)
     if not app_item:
         raise HTTPException(status_code=404, detail="App not found")
-    template = templates_env.get_template("app.html")
-    html = template.render(app_item=app_item, request=request)
+    html = _TPL_APP.render(app_item=app_item, request=request)
     return HTMLResponse(content=html, status_code=200)
 
 
+# APPS is static, so serialize it once (same compact encoding as FastAPI's JSONResponse)
+_APPS_JSON = jsonio.dumps([a.model_dump() for a in APPS], pretty=False)
+_APPS_ETAG = _etag(_APPS_JSON)
+
+
 @app.get("/api/apps")
-async def api_apps():
-    return [a.model_dump() for a in APPS]
-
-# Include module routers
-app.include_router(sales_router)
-app.include_router(catalogs_router)
-app.include_router(accounting_router)
-app.include_router(finance_router)
-app.include_router(purchases_router)
-app.include_router(inventory_router)
-app.include_router(settings_router)
-app.include_router(production_router)
-app.include_router(mrp_router)
-app.include_router(zatca_router)
-app.include_router(employees_router)
-app.include_router(time_router)
-app.include_router(hr_router)
-app.include_router(auth_router)
-app.include_router(banking_router)
-app.include_router(chart_router)
-app.include_router(slitting_router)
-app.include_router(quality_router)
-# Initialize database (users, customers, products)
-init_db()
+async def api_apps(request: Request):
+    headers = {"ETag": _APPS_ETAG, "Cache-Control": "public, max-age=300"}
+    if _etag_matches(request, _APPS_ETAG):
+        return Response(status_code=304, headers=headers)
+    return Response(content=_APPS_JSON, media_type="application/json", headers=headers)
+
+# Module routers are imported and included on the first request under their
+# prefix, so a cold start only pays for the modules it actually serves.
+_LAZY_ROUTERS: list[tuple[str, str]] = [
+    ("/mail", "sales"),
+    ("/catalogs", "catalogs"),
+    ("/accounting", "accounting"),
+    ("/accounting", "finance"),
+    ("/purchases", "purchases"),
+    ("/inventory", "inventory"),
+    ("/settings", "settings"),
+    ("/production", "production"),
+    ("/mrp", "mrp"),
+    ("/zatca", "zatca"),
+    ("/employees", "employees"),
+    ("/time", "time"),
+    ("/hr", "hr"),
+    ("/auth", "auth"),
+    ("/banking", "banking"),
+    ("/chart", "chart"),
+    ("/slitting", "slitting"),
+    ("/quality", "quality"),
+]
+_loaded_routers: set[str] = set()
+
+
+def _include_routers_for_path(path: str) -> None:
+    # API docs need every route registered
+    load_all = path in (app.openapi_url, app.docs_url, app.redoc_url)
+    for prefix, module_name in _LAZY_ROUTERS:
+        if module_name in _loaded_routers:
+            continue
+        if load_all or path == prefix or path.startswith(prefix + "/"):
+            module = importlib.import_module(f".modules.{module_name}", __package__)
+            app.include_router(module.router)
+            _loaded_routers.add(module_name)
+            app.openapi_schema = None
+
+
+@app.middleware("http")
+async def _lazy_include_routers(request: Request, call_next):
+    _include_routers_for_path(request.url.path)
+    return await call_next(request)
+
+# Database (users, customers, products) is initialized lazily; see db.ensure_db
 
 # --- Simple scheduler for document expiry alerts ---
-import threading
-import time
-import json
+import contextlib
+import os
 from pathlib import Path
 
-_stop_event = threading.Event()
+_scheduler_task: asyncio.Task | None = None
+# Digest of the last alerts payload written, to skip identical rewrites
+_last_alerts_digest: str | None = None
 
 def _compute_expiry_alerts() -> list[dict]:
     DATA_DIR = Path("backend/data")
     EMPLOYEES_FILE = DATA_DIR / "employees.json"
     try:
-        emps = json.loads(EMPLOYEES_FILE.read_text(encoding="utf-8"))
+        emps = jsonio.loads(EMPLOYEES_FILE.read_bytes())
     except Exception:
         emps = []
     from datetime import datetime, date
@@ -262,24 +271,67 @@ def _compute_expiry_alerts() -> list[dict]:
             })
     return alerts
 
-def _scheduler_loop():
+def _write_expiry_alerts() -> list[dict]:
+    global _last_alerts_digest
     DATA_DIR = Path("backend/data")
     ALERTS_FILE = DATA_DIR / "alerts.json"
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-    while not _stop_event.is_set():
-        alerts = _compute_expiry_alerts()
-        try:
-            ALERTS_FILE.write_text(json.dumps(alerts, ensure_ascii=False, indent=2), encoding="utf-8")
-        except Exception:
-            pass
+    alerts = _compute_expiry_alerts()
+    body = jsonio.dumps(alerts)
+    digest = hashlib.blake2s(body).hexdigest()
+    if digest == _last_alerts_digest:
+        return alerts
+    try:
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        ALERTS_FILE.write_bytes(body)
+        _last_alerts_digest = digest
+    except Exception:
+        pass
+    return alerts
+
+async def _scheduler_loop():
+    while True:
+        # File I/O runs in the default executor so request handlers are not blocked
+        await asyncio.to_thread(_write_expiry_alerts)
         # Sleep for a minute; adjust as needed
-        _stop_event.wait(60)
+        await asyncio.sleep(60)
+
+def _is_serverless() -> bool:
+    # Serverless instances are frozen between invocations, so a background task never runs reliably
+    return bool(os.environ.get("VERCEL") or os.environ.get("AWS_LAMBDA_FUNCTION_NAME"))
+
+def _cron_authorized(request: Request) -> bool:
+    # External schedulers send "Authorization: Bearer $CRON_SECRET" (the Vercel cron convention)
+    secret = os.environ.get("CRON_SECRET")
+    if not secret:
+        return False
+    return hmac.compare_digest(request.headers.get("authorization", ""), f"Bearer {secret}")
+
+@app.get("/api/alerts/recompute")
+async def alerts_recompute(request: Request):
+    """Recompute document expiry alerts on demand; on Vercel the cron in vercel.json calls this.
+
+    Needs the CRON_SECRET bearer token or an admin/HR session; only the alert count
+    is returned, the alerts themselves stay behind the HR pages.
+    """
+    if not _cron_authorized(request):
+        from .modules.auth import require_roles
+        denied = require_roles(request, ["admin", "hr"])
+        if denied is not None:
+            return denied
+    alerts = await asyncio.to_thread(_write_expiry_alerts)
+    return {"count": len(alerts)}
 
 @app.on_event("startup")
 async def _start_scheduler():
-    t = threading.Thread(target=_scheduler_loop, daemon=True)
-    t.start()
+    global _scheduler_task
+    if _is_serverless():
+        return
+    _scheduler_task = asyncio.create_task(_scheduler_loop())
 
 @app.on_event("shutdown")
 async def _stop_scheduler():
-    _stop_event.set()
\ No newline at end of file
+    if _scheduler_task is None:
+        return
+    _scheduler_task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await _scheduler_task
\ No newline at end of file
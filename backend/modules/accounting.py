@@ -1,13 +1,17 @@
 from __future__ import annotations
 
-import json
+import threading
+from bisect import bisect_left
+from collections import defaultdict
 from pathlib import Path
 from datetime import datetime, timedelta
+from typing import NamedTuple
 from fastapi import APIRouter, Request, Form
 from fastapi.responses import HTMLResponse
 from starlette.responses import RedirectResponse
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from ..templating import templates_env
 from ..db import SessionLocal, Customer
+from .. import jsonio
 
 DATA_DIR = Path("backend/data")
 AR_LEDGER_FILE = DATA_DIR / "ar_ledger.json"
@@ -21,53 +25,102 @@ def _load_json(path: Path) -> list[dict]:
     if not path.exists():
         return []
     try:
-        return json.loads(path.read_text(encoding="utf-8"))
+        return jsonio.loads(path.read_bytes())
     except Exception:
         return []
 
 
+# Parsed JSON per file, reused until the file's (mtime_ns, size) changes
+_json_cache: dict[Path, tuple[tuple[int, int], list[dict]]] = {}
+_json_cache_lock = threading.Lock()
+
+
+def _load_json_cached(path: Path) -> list[dict]:
+    """Like _load_json, but only re-reads the file when it changed on disk.
+
+    The returned list is shared between callers and must not be mutated.
+    """
+    try:
+        st = path.stat()
+    except OSError:
+        return []
+    key = (st.st_mtime_ns, st.st_size)
+    with _json_cache_lock:
+        hit = _json_cache.get(path)
+        if hit is not None and hit[0] == key:
+            return hit[1]
+        data = _load_json(path)
+        _json_cache[path] = (key, data)
+        return data
+
+
 def load_ar() -> list[dict]:
-    return _load_json(AR_LEDGER_FILE)
+    return _load_json_cached(AR_LEDGER_FILE)
 
 
 def save_ar(entries: list[dict]):
-    AR_LEDGER_FILE.write_text(json.dumps(entries, indent=2), encoding="utf-8")
+    jsonio.write_atomic(AR_LEDGER_FILE, jsonio.dumps(entries))
 
 
 def append_ar_entry(entry: dict):
-    entries = load_ar()
-    entries.append(entry)
-    save_ar(entries)
+    save_ar([*load_ar(), entry])
 
 
 def load_invoices() -> list[dict]:
-    return _load_json(INVOICES_FILE)
+    return _load_json_cached(INVOICES_FILE)
 
 
-def invoice_open_amount(entries: list[dict], invoice_id: str) -> float:
-    amt = 0.0
+# Signed effect of each ledger entry type on the AR balance
+_ENTRY_SIGN = {"invoice": 1.0, "adjustment": 1.0, "payment": -1.0, "credit": -1.0}
+
+
+class LedgerRow(NamedTuple):
+    invoice_id: str | None
+    customer: str | None
+    delta: float  # signed effect on the AR balance
+
+
+_ledger_rows_cache: tuple[list[dict], list[LedgerRow]] | None = None
+
+
+def _ledger_rows(entries: list[dict]) -> list[LedgerRow]:
+    """Typed, pre-signed view of ledger entries; entries of unknown type are dropped.
+
+    Rebuilt only when load_ar() hands out a new list (i.e. the file changed).
+    """
+    global _ledger_rows_cache
+    cached = _ledger_rows_cache
+    if cached is not None and cached[0] is entries:
+        return cached[1]
+    sign_of = _ENTRY_SIGN.get
+    rows = []
     for e in entries:
-        if e.get("invoice_id") == invoice_id:
-            if e.get("type") == "invoice":
-                amt += float(e.get("amount", 0.0))
-            elif e.get("type") in ("payment", "credit"):
-                amt -= float(e.get("amount", 0.0))
-            elif e.get("type") == "adjustment":
-                amt += float(e.get("amount", 0.0))
-    return round(amt, 2)
+        sign = sign_of(e.get("type"))
+        if sign is not None:
+            rows.append(LedgerRow(e.get("invoice_id"), e.get("customer"), sign * float(e.get("amount", 0.0))))
+    _ledger_rows_cache = (entries, rows)
+    return rows
+
+
+def _aggregate_ledger(entries: list[dict]) -> tuple[dict[str, float], dict[str, float]]:
+    """Sum signed ledger amounts per invoice and per customer in a single pass."""
+    inv_totals: dict[str, float] = defaultdict(float)
+    cust_totals: dict[str, float] = defaultdict(float)
+    for r in _ledger_rows(entries):
+        inv_totals[r.invoice_id] += r.delta
+        cust_totals[r.customer] += r.delta
+    return (
+        {k: round(v, 2) for k, v in inv_totals.items()},
+        {k: round(v, 2) for k, v in cust_totals.items()},
+    )
+
+
+def invoice_open_amount(entries: list[dict], invoice_id: str) -> float:
+    return round(sum(r.delta for r in _ledger_rows(entries) if r.invoice_id == invoice_id), 2)
 
 
 def customer_balance(entries: list[dict], customer: str) -> float:
-    amt = 0.0
-    for e in entries:
-        if e.get("customer") == customer:
-            if e.get("type") == "invoice":
-                amt += float(e.get("amount", 0.0))
-            elif e.get("type") in ("payment", "credit"):
-                amt -= float(e.get("amount", 0.0))
-            elif e.get("type") == "adjustment":
-                amt += float(e.get("amount", 0.0))
-    return round(amt, 2)
+    return round(sum(r.delta for r in _ledger_rows(entries) if r.customer == customer), 2)
 
 
 def due_date_from_invoice(inv: dict, days: int = 30) -> datetime:
@@ -79,6 +132,11 @@ def due_date_from_invoice(inv: dict, days: int = 30) -> datetime:
     return dt + timedelta(days=days)
 
 
+# Upper bound (days overdue, inclusive) of each bucket but the last: <=0 current, 1-30, 31-60, 61-90, >90
+_AGING_BOUNDS = (0, 30, 60, 90)
+_AGING_BUCKETS = ("current", "30", "60", "90", "120")
+
+
 def aging_buckets(open_invoices: list[dict]) -> dict:
     # Returns {customer: {"current": x, "30": y, "60": z, "90": w, "120": u}}
     buckets: dict[str, dict[str, float]] = {}
@@ -88,30 +146,24 @@ def aging_buckets(open_invoices: list[dict]) -> dict:
         amt = float(inv.get("open", 0.0))
         if amt <= 0:
             continue
-        dd = due_date_from_invoice(inv)
-        days_over = (now - dd).days
-        key = "current"
-        if days_over > 0 and days_over <= 30:
-            key = "30"
-        elif days_over <= 60:
-            key = "60"
-        elif days_over <= 90:
-            key = "90"
-        elif days_over > 90:
-            key = "120"
-        buckets.setdefault(cust, {"current": 0.0, "30": 0.0, "60": 0.0, "90": 0.0, "120": 0.0})
-        buckets[cust][key] += amt
+        days_over = (now - due_date_from_invoice(inv)).days
+        key = _AGING_BUCKETS[bisect_left(_AGING_BOUNDS, days_over)]
+        b = buckets.get(cust)
+        if b is None:
+            b = buckets[cust] = {"current": 0.0, "30": 0.0, "60": 0.0, "90": 0.0, "120": 0.0}
+        b[key] += amt
     # round
-    for cust, b in buckets.items():
-        for k in list(b.keys()):
-            b[k] = round(b[k], 2)
+    for b in buckets.values():
+        for k, v in b.items():
+            b[k] = round(v, 2)
     return buckets
 
 
-templates_env = Environment(
-    loader=FileSystemLoader("backend/templates"),
-    autoescape=select_autoescape(["html", "xml"]),
-)
+_TPL_AR = templates_env.get_template("accounting_ar.html")
+_TPL_AR_CUSTOMERS = templates_env.get_template("accounting_ar_customers.html")
+_TPL_AR_INVOICES = templates_env.get_template("accounting_ar_invoices.html")
+_TPL_AR_AGING = templates_env.get_template("accounting_ar_aging.html")
+_TPL_AR_ADJUSTMENT_NEW = templates_env.get_template("accounting_ar_adjustment_new.html")
 
 router = APIRouter(prefix="/accounting", tags=["Accounting"])
 
@@ -119,13 +171,12 @@ router = APIRouter(prefix="/accounting", tags=["Accounting"])
 @router.get("/ar", response_class=HTMLResponse)
 async def ar_list(request: Request):
     entries = load_ar()
-    tpl = templates_env.get_template("accounting_ar.html")
-    return HTMLResponse(tpl.render(request=request, entries=entries))
+    return HTMLResponse(_TPL_AR.render(request=request, entries=entries))
 
 
 @router.get("/ar/customers", response_class=HTMLResponse)
 async def ar_customers(request: Request):
-    entries = load_ar()
+    _, balances = _aggregate_ledger(load_ar())
     # Base list from DB for visibility
     with SessionLocal() as db:
         db_customers = db.query(Customer).order_by(Customer.name.asc()).all()
@@ -135,21 +186,21 @@ async def ar_customers(request: Request):
             "name": c.name,
             "country": c.country_code or "-",
             "ar_account": c.ar_account or "AR",
-            "balance": customer_balance(entries, c.name),
+            "balance": balances.get(c.name, 0.0),
         })
-    tpl = templates_env.get_template("accounting_ar_customers.html")
-    return HTMLResponse(tpl.render(request=request, customers=rows))
+    return HTMLResponse(_TPL_AR_CUSTOMERS.render(request=request, customers=rows))
 
 
 @router.get("/ar/invoices", response_class=HTMLResponse)
 async def ar_invoices(request: Request):
-    entries = load_ar()
+    open_by_invoice, _ = _aggregate_ledger(load_ar())
     invoices = load_invoices()
+    now = datetime.utcnow()
     rows = []
     for inv in invoices:
-        open_amt = invoice_open_amount(entries, inv.get("id"))
+        open_amt = open_by_invoice.get(inv.get("id"), 0.0)
         dd = due_date_from_invoice(inv)
-        status = "paid" if open_amt <= 0 else ("overdue" if datetime.utcnow() > dd else "open")
+        status = "paid" if open_amt <= 0 else ("overdue" if now > dd else "open")
         rows.append({
             "id": inv.get("id"),
             "customer": inv.get("customer"),
@@ -159,33 +210,30 @@ async def ar_invoices(request: Request):
             "open": open_amt,
             "status": status,
         })
-    tpl = templates_env.get_template("accounting_ar_invoices.html")
-    return HTMLResponse(tpl.render(request=request, invoices=rows))
+    return HTMLResponse(_TPL_AR_INVOICES.render(request=request, invoices=rows))
 
 
 @router.get("/ar/aging", response_class=HTMLResponse)
 async def ar_aging(request: Request):
-    entries = load_ar()
+    open_by_invoice, _ = _aggregate_ledger(load_ar())
     invoices = load_invoices()
     # Build list of open invoices with open amount
     open_invs = []
     for inv in invoices:
-        open_amt = invoice_open_amount(entries, inv.get("id"))
+        open_amt = open_by_invoice.get(inv.get("id"), 0.0)
         if open_amt > 0:
             inv_copy = dict(inv)
             inv_copy["open"] = open_amt
             open_invs.append(inv_copy)
     buckets = aging_buckets(open_invs)
-    tpl = templates_env.get_template("accounting_ar_aging.html")
-    return HTMLResponse(tpl.render(request=request, aging=buckets))
+    return HTMLResponse(_TPL_AR_AGING.render(request=request, aging=buckets))
 
 
 @router.get("/ar/adjustments/new", response_class=HTMLResponse)
 async def ar_adjustment_new(request: Request):
     with SessionLocal() as db:
         customers = db.query(Customer).order_by(Customer.name.asc()).all()
-    tpl = templates_env.get_template("accounting_ar_adjustment_new.html")
-    return HTMLResponse(tpl.render(request=request, customers=customers))
+    return HTMLResponse(_TPL_AR_ADJUSTMENT_NEW.render(request=request, customers=customers))
 
 
 @router.post("/ar/adjustments")
@@ -1,84 +1,214 @@
 from __future__ import annotations
 
-import json
+import asyncio
 import hashlib
+import hmac
+import logging
+import os
+import secrets
+import threading
+import time
 from pathlib import Path
 from typing import Optional
 
 from fastapi import APIRouter, Request, Form
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response
 from starlette.responses import RedirectResponse
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from ..templating import templates_env
 
+from ..db import hash_password, verify_password
+from .. import jsonio
 
-templates_env = Environment(
-    loader=FileSystemLoader("backend/templates"),
-    autoescape=select_autoescape(["html", "xml"]),
-)
+
+_TPL_AUTH_LOGIN = templates_env.get_template("auth_login.html")
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
+logger = logging.getLogger(__name__)
+
 DATA_DIR = Path("backend/data")
 USERS_FILE = DATA_DIR / "users.json"
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 if not USERS_FILE.exists():
-    # Initialize with a default admin user: admin/admin (hashed)
+    # Initialize with a default admin user: admin/admin (salted scrypt hash)
     default = [{
         "username": "admin",
-        "password_hash": hashlib.sha256("admin".encode("utf-8")).hexdigest(),
+        "password_hash": hash_password("admin"),
         "role": "admin"
     }]
-    USERS_FILE.write_text(json.dumps(default, ensure_ascii=False, indent=2), encoding="utf-8")
+    USERS_FILE.write_bytes(jsonio.dumps(default))
 
+# Key for signing session cookies: SESSION_SECRET if set, otherwise one generated on
+# first start and kept next to the data so every worker and restart shares it.
+SESSION_SECRET_FILE = DATA_DIR / "session_secret"
+SESSION_MAX_AGE = 86400  # seconds
 
-def load_users() -> list[dict]:
+
+def _read_session_secret() -> bytes | None:
+    try:
+        return bytes.fromhex(SESSION_SECRET_FILE.read_text(encoding="utf-8").strip()) or None
+    except (OSError, ValueError):
+        return None
+
+
+def _load_session_secret() -> bytes:
+    env = os.environ.get("SESSION_SECRET")
+    if env:
+        return env.encode("utf-8")
+    key = _read_session_secret()
+    if key:
+        return key
+    key = secrets.token_bytes(32)
     try:
-        return json.loads(USERS_FILE.read_text(encoding="utf-8"))
-    except Exception:
-        return []
+        # O_EXCL: when several workers start at once, exactly one creates the key
+        fd = os.open(SESSION_SECRET_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Another worker won; give it a moment to finish writing, then use its key
+        for _ in range(20):
+            existing = _read_session_secret()
+            if existing:
+                return existing
+            time.sleep(0.05)
+        logger.warning("%s is unreadable or invalid; using a per-process session key. "
+                       "Set SESSION_SECRET to share sessions across workers and restarts.", SESSION_SECRET_FILE)
+        return key
+    except OSError as exc:
+        logger.warning("Cannot create %s (%s); using a per-process session key. "
+                       "Set SESSION_SECRET to share sessions across workers and restarts.", SESSION_SECRET_FILE, exc)
+        return key
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(key.hex())
+    return key
+
+
+_SESSION_SECRET = _load_session_secret()
+
+
+# Parsed users.json plus a username index, reused until the file's (mtime_ns, size) changes
+_users_cache: tuple[tuple[int, int], list[dict], dict[str, dict]] | None = None
+_users_cache_lock = threading.Lock()
+
+
+def _users_snapshot() -> tuple[list[dict], dict[str, dict]]:
+    global _users_cache
+    try:
+        st = USERS_FILE.stat()
+    except OSError:
+        return [], {}
+    key = (st.st_mtime_ns, st.st_size)
+    with _users_cache_lock:
+        cached = _users_cache
+        if cached is not None and cached[0] == key:
+            return cached[1], cached[2]
+        try:
+            users = jsonio.loads(USERS_FILE.read_bytes())
+        except Exception:
+            users = []
+        by_name: dict[str, dict] = {}
+        for u in users:
+            by_name.setdefault(u.get("username"), u)  # first match wins, as with the old scan
+        _users_cache = (key, users, by_name)
+        return users, by_name
+
+
+def load_users() -> list[dict]:
+    """Users from users.json; the returned list is shared and must not be mutated."""
+    return _users_snapshot()[0]
 
 
 def get_user(username: str) -> Optional[dict]:
-    return next((u for u in load_users() if u.get("username") == username), None)
+    return _users_snapshot()[1].get(username)
+
+
+# Verified against when there is no scrypt hash to check, so an unknown username or
+# a legacy digest costs the same scrypt run as a real check
+_DUMMY_HASH = "scrypt$" + "00" * 16 + "$" + "00" * 32
 
 
 def check_password(user: dict, password: str) -> bool:
-    ph = user.get("password_hash", "")
-    return ph == hashlib.sha256((password or "").encode("utf-8")).hexdigest()
+    # Accepts both scrypt hashes and legacy unsalted SHA-256 digests, compared in constant time
+    password_hash = user.get("password_hash") or ""
+    if not password_hash.startswith("scrypt$"):
+        verify_password(password or "", _DUMMY_HASH)
+    return verify_password(password or "", password_hash)
+
+
+def _sign(payload: str) -> str:
+    return hmac.new(_SESSION_SECRET, payload.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def make_session_token(username: str, role: str) -> str:
+    payload = f"{username}|{role}|{int(time.time())}"
+    return f"{payload}|{_sign(payload)}"
+
+
+def read_session_token(token: str, max_age: int = SESSION_MAX_AGE) -> Optional[dict]:
+    """Return {"username", "role"} from a valid, unexpired session token, else None."""
+    try:
+        payload, sig = token.rsplit("|", 1)
+        username, role, issued = payload.rsplit("|", 2)
+        issued_at = int(issued)
+    except ValueError:
+        return None
+    if not hmac.compare_digest(sig, _sign(payload)):
+        return None
+    if time.time() - issued_at > max_age:
+        return None
+    return {"username": username, "role": role}
 
 
 def get_current_user(request: Request) -> Optional[dict]:
-    uname = request.cookies.get("session_user") or ""
-    if not uname:
+    # The signed cookie carries username and role, so no users.json lookup is needed
+    token = request.cookies.get("session_user") or ""
+    if not token:
         return None
-    return get_user(uname)
+    return read_session_token(token)
 
 
-def require_roles(request: Request, roles: list[str]) -> Optional[HTMLResponse]:
+def _deny_unless(request: Request, allowed: frozenset[str]) -> Optional[Response]:
     user = get_current_user(request)
     if not user:
         # Not logged in; redirect to login
         return RedirectResponse(url="/auth/login", status_code=303)
-    role = (user.get("role") or "").lower()
-    allowed = [r.lower() for r in roles]
-    if role not in allowed:
+    if (user.get("role") or "").lower() not in allowed:
         return HTMLResponse("Forbidden: insufficient permissions", status_code=403)
     return None
 
 
+def require_roles(request: Request, roles: list[str]) -> Optional[Response]:
+    return _deny_unless(request, frozenset(r.lower() for r in roles))
+
+
+def role_guard(*roles: str):
+    """Dependency that yields None for an allowed user, else the response to return instead.
+
+    The role set is built once, when the route module is imported:
+
+        denied: Optional[Response] = Depends(role_guard("admin", "hr"))
+    """
+    allowed = frozenset(r.lower() for r in roles)
+
+    def check(request: Request) -> Optional[Response]:
+        return _deny_unless(request, allowed)
+
+    return check
+
+
 @router.get("/login", response_class=HTMLResponse)
 async def login_page(request: Request, error: str | None = None):
-    tpl = templates_env.get_template("auth_login.html")
-    return HTMLResponse(tpl.render(request=request, error=error or ""))
+    return HTMLResponse(_TPL_AUTH_LOGIN.render(request=request, error=error or ""))
 
 
 @router.post("/login")
 async def login(username: str = Form(""), password: str = Form("")):
     user = get_user((username or "").strip())
-    if not user or not check_password(user, password or ""):
+    # scrypt takes tens of milliseconds; keep it off the event loop
+    ok = await asyncio.to_thread(check_password, user or {}, password or "")
+    if not user or not ok:
         return RedirectResponse(url="/auth/login?error=Invalid%20credentials", status_code=303)
     resp = RedirectResponse(url="/", status_code=303)
-    resp.set_cookie("session_user", user.get("username") or "", httponly=True, samesite="lax")
+    token = make_session_token(user.get("username") or "", user.get("role") or "")
+    resp.set_cookie("session_user", token, max_age=SESSION_MAX_AGE, httponly=True, samesite="lax")
     return resp
 
 
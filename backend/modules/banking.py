@@ -1,26 +1,40 @@
 from __future__ import annotations
 
-import json
+import asyncio
+import threading
+from contextlib import contextmanager
+from collections import defaultdict
 from pathlib import Path
 from datetime import datetime
-from typing import Optional
+from typing import Annotated, NamedTuple, Optional
 
 from fastapi import APIRouter, Request, Form
 from fastapi.responses import HTMLResponse
+from pydantic import BaseModel
 from starlette.responses import RedirectResponse
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from ..templating import stream_template, templates_env
 
+from .. import jsonio
+from ..httpcache import cache_headers, etag_matches, file_version, not_modified, weak_etag
 
-templates_env = Environment(
-    loader=FileSystemLoader("backend/templates"),
-    autoescape=select_autoescape(["html", "xml"]),
-)
+try:
+    import fcntl  # POSIX only; serializes id allocation across worker processes
+except ImportError:
+    fcntl = None
+
+
+_TPL_BANK_ACCOUNTS = templates_env.get_template("bank_accounts.html")
+_TPL_BANK_ACCOUNT_NEW = templates_env.get_template("bank_account_new.html")
+_TPL_BANK_TRANSACTIONS = templates_env.get_template("bank_transactions.html")
+_TPL_BANK_TRANSACTION_NEW = templates_env.get_template("bank_transaction_new.html")
+_TPL_BANK_RECONCILE = templates_env.get_template("bank_reconcile.html")
 
 router = APIRouter(prefix="/banking", tags=["Banking"])
 
 DATA_DIR = Path("backend/data")
 BANK_ACCOUNTS_FILE = DATA_DIR / "bank_accounts.json"
 BANK_TX_FILE = DATA_DIR / "bank_transactions.json"
+COUNTERS_FILE = DATA_DIR / "counters.json"
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 for f in [BANK_ACCOUNTS_FILE, BANK_TX_FILE]:
     if not f.exists():
@@ -29,109 +43,247 @@ for f in [BANK_ACCOUNTS_FILE, BANK_TX_FILE]:
 
 def _load_json(path: Path) -> list[dict]:
     try:
-        return json.loads(path.read_text(encoding="utf-8") or "[]")
+        return jsonio.loads(path.read_bytes())
     except Exception:
         return []
 
 
 def _save_json(path: Path, data: list[dict]) -> None:
-    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    jsonio.write_atomic(path, jsonio.dumps(data))
+
+
+class _TxSnapshot(NamedTuple):
+    txs: list[dict]
+    by_id: dict[str, int]  # transaction id -> position in txs
+    by_account: dict[str, list[dict]]  # account_id -> its transactions, in file order
+
+
+# Parsed bank_transactions.json plus its indexes, keyed on the file's (mtime_ns, size)
+_tx_cache: tuple[tuple[int, int], _TxSnapshot] | None = None
+_tx_lock = threading.Lock()
+
+
+def _file_key(path: Path) -> tuple[int, int] | None:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _index_transactions(txs: list[dict]) -> _TxSnapshot:
+    by_id: dict[str, int] = {}
+    by_account: dict[str, list[dict]] = defaultdict(list)
+    for i, t in enumerate(txs):
+        by_id.setdefault(t.get("id"), i)
+        by_account[t.get("account_id")].append(t)
+    return _TxSnapshot(txs, by_id, dict(by_account))
+
+
+def _tx_snapshot() -> _TxSnapshot:
+    global _tx_cache
+    key = _file_key(BANK_TX_FILE)
+    with _tx_lock:
+        cached = _tx_cache
+        if cached is not None and key is not None and cached[0] == key:
+            return cached[1]
+        snap = _index_transactions(_load_json(BANK_TX_FILE))
+        if key is not None:
+            _tx_cache = (key, snap)
+        return snap
+
+
+def load_transactions(account_id: str = "") -> list[dict]:
+    """Bank transactions, optionally only those of one account.
+
+    The lists are cached and shared, so treat them as read-only and save an edited
+    copy with save_transactions().
+    """
+    snap = _tx_snapshot()
+    if account_id:
+        return snap.by_account.get(account_id, [])
+    return snap.txs
+
+
+def save_transactions(txs: list[dict]) -> None:
+    global _tx_cache
+    with _tx_lock:
+        try:
+            _save_json(BANK_TX_FILE, txs)
+        except Exception:
+            _tx_cache = None  # the file may no longer match the cached list
+            raise
+        key = _file_key(BANK_TX_FILE)
+        _tx_cache = (key, _index_transactions(txs)) if key is not None else None
+
+
+# --- Id allocation ---
+# Last issued number per id series, kept in counters.json so creating a record does
+# not need to load and count the whole file. A missing series is seeded from the
+# highest existing id, so ids already on disk are never reissued.
+_counters_lock = threading.Lock()
+
+
+@contextmanager
+def _counters_file_lock():
+    with _counters_lock, open(COUNTERS_FILE.with_name(COUNTERS_FILE.name + ".lock"), "a+b") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        yield
+
+
+def _max_id_number(path: Path, prefix: str) -> int:
+    highest = 0
+    for item in _load_json(path):
+        tail = str(item.get("id") or "").removeprefix(prefix + "-")
+        if tail.isdigit():
+            highest = max(highest, int(tail))
+    return highest
+
+
+def next_id(key: str, prefix: str, width: int, source: Path) -> str:
+    """Allocate the next "<prefix>-<n>" id for the series stored under key."""
+    with _counters_file_lock():
+        try:
+            counters = jsonio.loads(COUNTERS_FILE.read_bytes())
+        except Exception:
+            counters = {}
+        n = counters.get(key)
+        if n is None:
+            n = _max_id_number(source, prefix)
+        n += 1
+        counters[key] = n
+        jsonio.write_atomic(COUNTERS_FILE, jsonio.dumps(counters))
+    return f"{prefix}-{n:0{width}d}"
+
+
+# Handlers run their file I/O in worker threads; this keeps concurrent
+# read-modify-write cycles on the JSON stores from interleaving.
+_write_lock = threading.Lock()
+
+
+def _create_account(name: str, number: str) -> None:
+    with _write_lock:
+        acct_id = next_id("bank_accounts", "BA", 3, BANK_ACCOUNTS_FILE)
+        accounts = _load_json(BANK_ACCOUNTS_FILE)
+        accounts.append({"id": acct_id, "name": name, "number": number})
+        _save_json(BANK_ACCOUNTS_FILE, accounts)
+
+
+def _create_transaction(tx: dict) -> None:
+    with _write_lock:
+        tx_id = next_id("bank_transactions", "BT", 5, BANK_TX_FILE)
+        save_transactions(load_transactions() + [{"id": tx_id, **tx}])
+
+
+def _set_reconciled_ref(tx_id: str, ref: dict) -> None:
+    with _write_lock:
+        snap = _tx_snapshot()
+        i = snap.by_id.get(tx_id)
+        if i is not None:
+            # Edit a copy; the cached dict is shared with the indexes and in-flight renders
+            edited = list(snap.txs)
+            edited[i] = {**snap.txs[i], "reconciled_ref": ref}
+            save_transactions(edited)
 
 
 @router.get("/accounts", response_class=HTMLResponse)
 async def accounts_list(request: Request):
-    accounts = _load_json(BANK_ACCOUNTS_FILE)
-    tpl = templates_env.get_template("bank_accounts.html")
-    return HTMLResponse(tpl.render(request=request, accounts=accounts))
+    etag = weak_etag(request.url.path, file_version(BANK_ACCOUNTS_FILE))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    accounts = await asyncio.to_thread(_load_json, BANK_ACCOUNTS_FILE)
+    return HTMLResponse(_TPL_BANK_ACCOUNTS.render(request=request, accounts=accounts), headers=cache_headers(etag))
 
 
 @router.get("/accounts/new", response_class=HTMLResponse)
 async def accounts_new(request: Request):
-    tpl = templates_env.get_template("bank_account_new.html")
-    return HTMLResponse(tpl.render(request=request))
+    return HTMLResponse(_TPL_BANK_ACCOUNT_NEW.render(request=request))
 
 
 @router.post("/accounts")
 async def accounts_create(name: str = Form(...), number: str = Form("")):
-    accounts = _load_json(BANK_ACCOUNTS_FILE)
-    acct_id = f"BA-{len(accounts)+1:03d}"
-    accounts.append({"id": acct_id, "name": name.strip(), "number": (number or "").strip()})
-    _save_json(BANK_ACCOUNTS_FILE, accounts)
+    await asyncio.to_thread(_create_account, name.strip(), (number or "").strip())
     return RedirectResponse(url="/banking/accounts", status_code=303)
 
 
 @router.get("/transactions", response_class=HTMLResponse)
 async def transactions_list(request: Request, account_id: str = ""):
-    accounts = _load_json(BANK_ACCOUNTS_FILE)
-    txs = _load_json(BANK_TX_FILE)
-    if account_id:
-        txs = [t for t in txs if t.get("account_id") == account_id]
-    tpl = templates_env.get_template("bank_transactions.html")
-    return HTMLResponse(tpl.render(request=request, accounts=accounts, transactions=txs, selected_account=account_id))
+    etag = weak_etag(request.url.path, account_id, file_version(BANK_ACCOUNTS_FILE, BANK_TX_FILE))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    accounts, txs = await asyncio.gather(
+        asyncio.to_thread(_load_json, BANK_ACCOUNTS_FILE),
+        asyncio.to_thread(load_transactions, account_id),
+    )
+    return stream_template(
+        _TPL_BANK_TRANSACTIONS,
+        headers=cache_headers(etag),
+        request=request, accounts=accounts, transactions=txs, selected_account=account_id,
+    )
 
 
 @router.get("/transactions/new", response_class=HTMLResponse)
 async def transactions_new(request: Request):
-    accounts = _load_json(BANK_ACCOUNTS_FILE)
-    tpl = templates_env.get_template("bank_transaction_new.html")
-    return HTMLResponse(tpl.render(request=request, accounts=accounts))
+    accounts = await asyncio.to_thread(_load_json, BANK_ACCOUNTS_FILE)
+    return HTMLResponse(_TPL_BANK_TRANSACTION_NEW.render(request=request, accounts=accounts))
+
+
+class NewTransactionForm(BaseModel):
+    account_id: str
+    ttype: str = "in"  # in=deposit, out=withdrawal
+    amount: float
+    memo: str = ""
+    date: str = ""
 
 
 @router.post("/transactions")
-async def transactions_create(
-    account_id: str = Form(...),
-    ttype: str = Form("in"),  # in=deposit, out=withdrawal
-    amount: float = Form(...),
-    memo: str = Form(""),
-    date: str = Form(""),
-):
-    txs = _load_json(BANK_TX_FILE)
-    tx_id = f"BT-{len(txs)+1:05d}"
-    txs.append({
-        "id": tx_id,
-        "account_id": account_id,
-        "type": ttype,
-        "amount": float(amount),
-        "memo": memo,
-        "date": date or datetime.utcnow().isoformat(timespec="seconds") + "Z",
+async def transactions_create(form: Annotated[NewTransactionForm, Form()]):
+    await asyncio.to_thread(_create_transaction, {
+        "account_id": form.account_id,
+        "type": form.ttype,
+        "amount": form.amount,
+        "memo": form.memo,
+        "date": form.date or datetime.utcnow().isoformat(timespec="seconds") + "Z",
         "reconciled_ref": None,
     })
-    _save_json(BANK_TX_FILE, txs)
     return RedirectResponse(url="/banking/transactions", status_code=303)
 
 
 # --- Simple reconciliation between bank transactions and recorded payments ---
 @router.get("/reconcile", response_class=HTMLResponse)
 async def reconcile_list(request: Request, account_id: str = ""):
-    accounts = _load_json(BANK_ACCOUNTS_FILE)
+    # Independent file reads; run them concurrently off the event loop
+    accounts, txs, sales_payments, purchase_payments = await asyncio.gather(
+        asyncio.to_thread(_load_json, BANK_ACCOUNTS_FILE),
+        asyncio.to_thread(load_transactions, account_id),
+        asyncio.to_thread(_load_json, DATA_DIR / "payments.json"),
+        asyncio.to_thread(_load_json, DATA_DIR / "purchase_payments.json"),
+    )
     accounts_map = {a.get("id"): a.get("name") for a in accounts}
-    txs = _load_json(BANK_TX_FILE)
-    # Filter transactions by selected bank account if provided
-    if account_id:
-        txs = [t for t in txs if t.get("account_id") == account_id]
-    sales_payments = _load_json(DATA_DIR / "payments.json")
-    purchase_payments = _load_json(DATA_DIR / "purchase_payments.json")
-    # Only consider bank method payments
-    sales_bank = [p for p in sales_payments if (p.get("method") or "").lower() == "bank"]
-    purch_bank = [p for p in purchase_payments if (p.get("method") or "").lower() == "bank"]
-    tpl = templates_env.get_template("bank_reconcile.html")
-    return HTMLResponse(tpl.render(
+    # Only consider bank method payments, grouped by bank account so each
+    # transaction row looks up its candidates instead of scanning every payment
+    sales_by_account: dict[str, list[dict]] = defaultdict(list)
+    for p in sales_payments:
+        if (p.get("method") or "").lower() == "bank":
+            sales_by_account[p.get("bank_account_id")].append(p)
+    purchases_by_account: dict[str, list[dict]] = defaultdict(list)
+    for p in purchase_payments:
+        if (p.get("method") or "").lower() == "bank":
+            purchases_by_account[p.get("bank_account_id")].append(p)
+    return HTMLResponse(_TPL_BANK_RECONCILE.render(
         request=request,
         accounts=accounts,
         accounts_map=accounts_map,
         transactions=txs,
-        sales_payments=sales_bank,
-        purchase_payments=purch_bank,
+        sales_by_account=sales_by_account,
+        purchases_by_account=purchases_by_account,
         selected_account=account_id,
     ))
 
 
 @router.post("/reconcile")
 async def reconcile_apply(tx_id: str = Form(...), ref_type: str = Form(...), ref_id: str = Form(...)):
-    txs = _load_json(BANK_TX_FILE)
-    for i, t in enumerate(txs):
-        if t.get("id") == tx_id:
-            txs[i]["reconciled_ref"] = {"type": ref_type, "id": ref_id, "date": datetime.utcnow().isoformat(timespec="seconds") + "Z"}
-            break
-    _save_json(BANK_TX_FILE, txs)
+    ref = {"type": ref_type, "id": ref_id, "date": datetime.utcnow().isoformat(timespec="seconds") + "Z"}
+    await asyncio.to_thread(_set_reconciled_ref, tx_id, ref)
     return RedirectResponse(url="/banking/reconcile", status_code=303)
\ No newline at end of file
@@ -1,43 +1,101 @@
+import asyncio
+from typing import Annotated
+
 from fastapi import APIRouter, Request, Form
 from fastapi.responses import HTMLResponse
+from pydantic import BaseModel
 from starlette.responses import RedirectResponse
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from sqlalchemy import func
+from sqlalchemy.orm import load_only
+from ..templating import stream_template, templates_env
+from ..httpcache import cache_headers, etag_matches, not_modified, weak_etag
 
 from ..db import SessionLocal, Customer, Product, default_vat_rate
 
-templates_env = Environment(
-    loader=FileSystemLoader("backend/templates"),
-    autoescape=select_autoescape(["html", "xml"]),
-)
+_TPL_CUSTOMERS_LIST = templates_env.get_template("customers_list.html")
+_TPL_CUSTOMERS_NEW = templates_env.get_template("customers_new.html")
+_TPL_PRODUCTS_LIST = templates_env.get_template("products_list.html")
+_TPL_PRODUCTS_NEW = templates_env.get_template("products_new.html")
 
 router = APIRouter(prefix="/catalogs", tags=["Catalogs"])
 
+# Country choices on the new-customer form, built once
+COUNTRIES = (
+    {"code": "US", "name": "United States"},
+    {"code": "GB", "name": "United Kingdom"},
+    {"code": "DE", "name": "Germany"},
+    {"code": "FR", "name": "France"},
+    {"code": "AE", "name": "United Arab Emirates"},
+    {"code": "SA", "name": "Saudi Arabia"},
+    {"code": "IN", "name": "India"},
+    {"code": "PK", "name": "Pakistan"},
+    {"code": "CA", "name": "Canada"},
+    {"code": "AU", "name": "Australia"},
+)
+_VAT_BY_COUNTRY = {c["code"]: default_vat_rate(c["code"]) for c in COUNTRIES}
+
+
+def _page_bounds(page: int, per_page: int, total_count: int) -> tuple[int, int, int]:
+    """Clamp paging params like inventory moves does; returns (page, per_page, total_pages)."""
+    if per_page <= 0:
+        per_page = 50
+    if page <= 0:
+        page = 1
+    total_pages = max(1, (total_count + per_page - 1) // per_page)
+    return page, per_page, total_pages
+
+
+# Database calls block, so handlers run them in worker threads via asyncio.to_thread
+
+def _table_state(model) -> tuple[int, int | None]:
+    """(row count, highest id); rows are only ever inserted, so this identifies the table state."""
+    with SessionLocal() as db:
+        total_count, max_id = db.query(func.count(model.id), func.max(model.id)).one()
+    return total_count or 0, max_id
+
+
+def _page_rows(model, page: int, per_page: int, columns: tuple = ()) -> list:
+    with SessionLocal() as db:
+        query = db.query(model)
+        if columns:
+            query = query.options(load_only(*columns))
+        return query.order_by(model.id.desc()).offset((page - 1) * per_page).limit(per_page).all()
+
+
+def _insert(row) -> None:
+    with SessionLocal() as db:
+        db.add(row)
+        db.commit()
+
 
 # Customers
+# Only the columns the list template shows
+_CUSTOMER_LIST_COLUMNS = (Customer.id, Customer.name, Customer.email, Customer.country_code, Customer.vat_rate, Customer.ar_account)
+
+
 @router.get("/customers", response_class=HTMLResponse)
-async def customers_list(request: Request):
-    with SessionLocal() as db:
-        customers = db.query(Customer).order_by(Customer.id.desc()).all()
-    tpl = templates_env.get_template("customers_list.html")
-    return HTMLResponse(tpl.render(request=request, customers=customers))
+async def customers_list(request: Request, page: int = 1, per_page: int = 50):
+    total_count, max_id = await asyncio.to_thread(_table_state, Customer)
+    page, per_page, total_pages = _page_bounds(page, per_page, total_count)
+    tag = weak_etag(request.url.path, page, per_page, total_count, max_id)
+    if etag_matches(request, tag):
+        return not_modified(tag)
+    customers = await asyncio.to_thread(_page_rows, Customer, page, per_page, _CUSTOMER_LIST_COLUMNS)
+    return stream_template(
+        _TPL_CUSTOMERS_LIST,
+        headers=cache_headers(tag),
+        request=request,
+        customers=customers,
+        page=page,
+        per_page=per_page,
+        total_pages=total_pages,
+        total_count=total_count,
+    )
 
 
 @router.get("/customers/new", response_class=HTMLResponse)
 async def customers_new(request: Request):
-    countries = [
-        {"code": "US", "name": "United States"},
-        {"code": "GB", "name": "United Kingdom"},
-        {"code": "DE", "name": "Germany"},
-        {"code": "FR", "name": "France"},
-        {"code": "AE", "name": "United Arab Emirates"},
-        {"code": "SA", "name": "Saudi Arabia"},
-        {"code": "IN", "name": "India"},
-        {"code": "PK", "name": "Pakistan"},
-        {"code": "CA", "name": "Canada"},
-        {"code": "AU", "name": "Australia"},
-    ]
-    tpl = templates_env.get_template("customers_new.html")
-    return HTMLResponse(tpl.render(request=request, countries=countries))
+    return HTMLResponse(_TPL_CUSTOMERS_NEW.render(request=request, countries=COUNTRIES))
 
 
 @router.post("/customers")
@@ -54,46 +112,61 @@ async def customers_create(
     vat_rate: float = Form(None),
 ):
     # compute defaults
-    vat = vat_rate if vat_rate is not None else default_vat_rate(country)
+    if vat_rate is not None:
+        vat = vat_rate
+    else:
+        # The form only offers COUNTRIES; anything else goes through the full lookup
+        vat = _VAT_BY_COUNTRY.get(country)
+        if vat is None:
+            vat = default_vat_rate(country)
     ar_account = f"AR-{country.upper()}" if country else "AR"
-    with SessionLocal() as db:
-        c = Customer(
-            name=name,
-            email=email,
-            address1=address1,
-            address2=address2,
-            city=city,
-            state=state,
-            postal_code=postal_code,
-            country_code=country or None,
-            vat_number=vat_number or None,
-            vat_rate=vat,
-            ar_account=ar_account,
-        )
-        db.add(c)
-        db.commit()
+    c = Customer(
+        name=name,
+        email=email,
+        address1=address1,
+        address2=address2,
+        city=city,
+        state=state,
+        postal_code=postal_code,
+        country_code=country or None,
+        vat_number=vat_number or None,
+        vat_rate=vat,
+        ar_account=ar_account,
+    )
+    await asyncio.to_thread(_insert, c)
     return RedirectResponse(url="/catalogs/customers", status_code=303)
 
 
 # Products
 @router.get("/products", response_class=HTMLResponse)
-async def products_list(request: Request):
-    with SessionLocal() as db:
-        products = db.query(Product).order_by(Product.id.desc()).all()
-    tpl = templates_env.get_template("products_list.html")
-    return HTMLResponse(tpl.render(request=request, products=products))
+async def products_list(request: Request, page: int = 1, per_page: int = 50):
+    total_count, max_id = await asyncio.to_thread(_table_state, Product)
+    page, per_page, total_pages = _page_bounds(page, per_page, total_count)
+    tag = weak_etag(request.url.path, page, per_page, total_count, max_id)
+    if etag_matches(request, tag):
+        return not_modified(tag)
+    products = await asyncio.to_thread(_page_rows, Product, page, per_page)
+    return HTMLResponse(_TPL_PRODUCTS_LIST.render(
+        request=request,
+        products=products,
+        page=page,
+        per_page=per_page,
+        total_pages=total_pages,
+        total_count=total_count,
+    ), headers=cache_headers(tag))
 
 
 @router.get("/products/new", response_class=HTMLResponse)
 async def products_new(request: Request):
-    tpl = templates_env.get_template("products_new.html")
-    return HTMLResponse(tpl.render(request=request))
+    return HTMLResponse(_TPL_PRODUCTS_NEW.render(request=request))
+
+
+class NewProductForm(BaseModel):
+    name: str
+    price: float = 0.0
 
 
 @router.post("/products")
-async def products_create(name: str = Form(...), price: float = Form(0.0)):
-    with SessionLocal() as db:
-        p = Product(name=name, price=price)
-        db.add(p)
-        db.commit()
+async def products_create(form: Annotated[NewProductForm, Form()]):
+    await asyncio.to_thread(_insert, Product(name=form.name, price=form.price))
     return RedirectResponse(url="/catalogs/products", status_code=303)
\ No newline at end of file
@@ -1,19 +1,24 @@
 from fastapi import APIRouter, Request
 from fastapi.responses import HTMLResponse
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from ..templating import templates_env
+from ..httpcache import cache_headers, etag, etag_matches, not_modified
 
 router = APIRouter(prefix="/chart", tags=["chart"])
 
-# Jinja2 templates setup
-templates_env = Environment(
-    loader=FileSystemLoader("backend/templates"),
-    autoescape=select_autoescape(["html", "xml"]),
-)
+_TPL_CHART_OVERVIEW = templates_env.get_template("chart_overview.html")
+# The page only depends on the request path, so each render is reused
+_overview_html: dict[str, tuple[str, str]] = {}
 
 
 @router.get("/", response_class=HTMLResponse)
 async def chart_overview(request: Request):
     """Chart overview page with analytics and reporting."""
-    template = templates_env.get_template("chart_overview.html")
-    html = template.render(request=request)
-    return HTMLResponse(content=html, status_code=200)
\ No newline at end of file
+    path = request.url.path
+    cached = _overview_html.get(path)
+    if cached is None:
+        html = _TPL_CHART_OVERVIEW.render(request=request)
+        cached = _overview_html[path] = (html, etag(html.encode("utf-8")))
+    html, tag = cached
+    if etag_matches(request, tag):
+        return not_modified(tag)
+    return HTMLResponse(content=html, status_code=200, headers=cache_headers(tag))
\ No newline at end of file
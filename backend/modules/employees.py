@@ -1,22 +1,29 @@
 from __future__ import annotations
 
-import json
+import asyncio
+import threading
+from functools import lru_cache
 from pathlib import Path
 from datetime import date, datetime
-from typing import List, Dict
+from typing import Annotated, List, Dict, Optional
 
-from fastapi import APIRouter, Request, Form
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, Depends, Request, Form
+from fastapi.responses import HTMLResponse, Response
+from pydantic import BaseModel
 from starlette.responses import RedirectResponse
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from ..templating import stream_template, templates_env
 
+from .. import jsonio
+from ..httpcache import cache_headers, etag_matches, file_version, not_modified, weak_etag
+from .auth import role_guard
 
-templates_env = Environment(
-    loader=FileSystemLoader("backend/templates"),
-    autoescape=select_autoescape(["html", "xml"]),
-)
+
+_TPL_EMPLOYEES_LIST = templates_env.get_template("employees_list.html")
+_TPL_EMPLOYEES_NEW = templates_env.get_template("employees_new.html")
+_TPL_EMPLOYEES_DETAIL = templates_env.get_template("employees_detail.html")
 
 router = APIRouter(prefix="/employees", tags=["Employees"])
+_HR_ADMIN = role_guard("admin", "hr")
 
 DATA_DIR = Path("backend/data")
 EMPLOYEES_FILE = DATA_DIR / "employees.json"
@@ -32,29 +39,91 @@ for f in [ORG_UNITS_FILE, POSITIONS_FILE]:
 
 def _load_json(path: Path) -> list | dict:
     try:
-        return json.loads(path.read_text(encoding="utf-8") or "[]")
+        return jsonio.loads(path.read_bytes())
     except Exception:
         return []
 
 
+# Parsed employees.json plus an emp_id -> position index, keyed on the file's (mtime_ns, size)
+_employees_cache: tuple[tuple[int, int], List[dict], Dict[str, int]] | None = None
+_employees_lock = threading.Lock()
+
+
+def _file_key(path: Path) -> tuple[int, int] | None:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _index_employees(items: List[dict]) -> Dict[str, int]:
+    index: Dict[str, int] = {}
+    for i, e in enumerate(items):
+        index.setdefault(e.get("emp_id"), i)  # first match wins, like a linear scan
+    return index
+
+
+def _employees_snapshot() -> tuple[List[dict], Dict[str, int]]:
+    global _employees_cache
+    key = _file_key(EMPLOYEES_FILE)
+    with _employees_lock:
+        cached = _employees_cache
+        if cached is not None and key is not None and cached[0] == key:
+            return cached[1], cached[2]
+        data = _load_json(EMPLOYEES_FILE)
+        items = data if isinstance(data, list) else []
+        index = _index_employees(items)
+        if key is not None:
+            _employees_cache = (key, items, index)
+        return items, index
+
+
 def load_employees() -> List[dict]:
-    data = _load_json(EMPLOYEES_FILE)
-    return data if isinstance(data, list) else []
+    """Employees from employees.json.
+
+    The list is cached and shared, so treat it as read-only and save an edited copy
+    with save_employees().
+    """
+    return _employees_snapshot()[0]
+
+
+def get_employee(emp_id: str) -> Optional[dict]:
+    items, index = _employees_snapshot()
+    i = index.get(emp_id)
+    return None if i is None else items[i]
 
 
 def save_employees(items: List[dict]) -> None:
-    EMPLOYEES_FILE.write_text(json.dumps(items, ensure_ascii=False, indent=2), encoding="utf-8")
+    global _employees_cache
+    with _employees_lock:
+        try:
+            jsonio.write_atomic(EMPLOYEES_FILE, jsonio.dumps(items))
+        except Exception:
+            _employees_cache = None  # the file may no longer match the cached list
+            raise
+        key = _file_key(EMPLOYEES_FILE)
+        _employees_cache = (key, items, _index_employees(items)) if key is not None else None
 
 
 # --- Saudi Labour Law Helpers (simplified) ---
 
-def years_of_service(hire_date: str, as_of: date | None = None) -> float:
+@lru_cache(maxsize=2048)
+def _date_ordinal(value: str) -> int | None:
+    # Parsing is the costly part and hire/separation dates repeat across renders and
+    # payroll runs; only the parse is cached, so results never go stale at midnight.
     try:
-        d = datetime.fromisoformat(hire_date).date()
+        return datetime.fromisoformat(value).date().toordinal()
     except Exception:
+        return None
+
+
+def years_of_service(hire_date: str, as_of: date | None = None) -> float:
+    start = _date_ordinal(hire_date)
+    if start is None:
         return 0.0
-    asof = as_of or date.today()
-    return max(0.0, (asof - d).days / 365.0)
+    asof = (as_of or date.today()).toordinal()
+    return max(0.0, (asof - start) / 365.0)
 
 
 def annual_leave_days(hire_date: str) -> int:
@@ -79,17 +148,7 @@ def compute_overtime_pay(base_salary: float, hours: float, day_type: str = "norm
     return round(rate * multiplier * float(hours), 2)
 
 
-def compute_eos_benefit(base_salary: float, hire_date: str, separation_date: str, reason: str = "termination") -> float:
-    # End of Service Benefit (simplified per KSA rules)
-    # Termination: 0.5 month per year for first 5 years, 1 month per year thereafter
-    # Resignation: none <2 years; 1/3 between 2-5; 2/3 between 5-10; full >=10
-    try:
-        start = datetime.fromisoformat(hire_date).date()
-        end = datetime.fromisoformat(separation_date).date()
-    except Exception:
-        return 0.0
-    yos = max(0.0, (end - start).days / 365.0)
-    monthly = float(base_salary)
+def _eos_for_years(monthly: float, yos: float, reason: str) -> float:
     if reason == "termination":
         if yos <= 0:
             return 0.0
@@ -111,114 +170,164 @@ def compute_eos_benefit(base_salary: float, hire_date: str, separation_date: str
             return round(full_benefit, 2)
 
 
+def compute_eos_benefit(base_salary: float, hire_date: str, separation_date: str, reason: str = "termination") -> float:
+    # End of Service Benefit (simplified per KSA rules)
+    # Termination: 0.5 month per year for first 5 years, 1 month per year thereafter
+    # Resignation: none <2 years; 1/3 between 2-5; 2/3 between 5-10; full >=10
+    start = _date_ordinal(hire_date)
+    end = _date_ordinal(separation_date)
+    if start is None or end is None:
+        return 0.0
+    yos = max(0.0, (end - start) / 365.0)
+    return _eos_for_years(float(base_salary), yos, reason)
+
+
+def compute_eos_benefits(employees: List[dict], separation_date: str, reason: str = "termination") -> Dict[str, float]:
+    """EOS benefit per emp_id for a common separation date (e.g. a bulk payroll run).
+
+    Same rules as compute_eos_benefit; every distinct date string is parsed once.
+    """
+    end_ordinal = _date_ordinal(separation_date)
+    if end_ordinal is None:
+        return {e.get("emp_id"): 0.0 for e in employees}
+    result: Dict[str, float] = {}
+    for e in employees:
+        start = _date_ordinal(e.get("hire_date", ""))
+        if start is None:
+            result[e.get("emp_id")] = 0.0
+            continue
+        yos = max(0.0, (end_ordinal - start) / 365.0)
+        result[e.get("emp_id")] = _eos_for_years(float(e.get("base_salary", 0.0)), yos, reason)
+    return result
+
+
+# Handlers run their file I/O in worker threads; this keeps concurrent
+# read-modify-write cycles on employees.json from interleaving.
+_write_lock = threading.Lock()
+
+
+def _add_employee(record: dict) -> None:
+    with _write_lock:
+        emps, index = _employees_snapshot()
+        if record["emp_id"] not in index:
+            save_employees([*emps, record])
+
+
+def _update_employee(emp_id: str, changes: dict) -> bool:
+    """Apply changes to one employee and save; False if there is no such employee."""
+    with _write_lock:
+        emps, index = _employees_snapshot()
+        i = index.get(emp_id)
+        if i is None:
+            return False
+        # Edit a copy; the cached list and dicts are only replaced once the save succeeds
+        edited = list(emps)
+        edited[i] = {**emps[i], **changes}
+        save_employees(edited)
+        return True
+
+
+# --- Identity document expiry ---
+
+@lru_cache(maxsize=4096)
+def _expiry_status(dstr: str, today_ordinal: int, threshold: int = 60) -> dict:
+    # Memoized per (date string, day); callers must treat the result as read-only
+    try:
+        days = datetime.strptime(dstr.strip(), "%Y-%m-%d").date().toordinal() - today_ordinal
+    except Exception:
+        return {"status": "unknown", "days": None}
+    if days < 0:
+        return {"status": "expired", "days": days}
+    if days <= threshold:
+        return {"status": "soon", "days": days}
+    return {"status": "ok", "days": days}
+
+
 # --- Routes ---
 
 @router.get("/", response_class=HTMLResponse)
 async def employees_list(request: Request, org_unit_id: str | None = None, expiry: str | None = None):
-    emps = load_employees()
-    def _days_until(dstr: str) -> int | None:
-        try:
-            d = datetime.strptime(dstr.strip(), "%Y-%m-%d").date()
-            return (d - date.today()).days
-        except Exception:
-            return None
-    def _expiry_status(dstr: str, threshold: int = 60) -> dict:
-        days = _days_until(dstr)
-        if days is None:
-            return {"status": "unknown", "days": None}
-        if days < 0:
-            return {"status": "expired", "days": days}
-        if days <= threshold:
-            return {"status": "soon", "days": days}
-        return {"status": "ok", "days": days}
-    for e in emps:
-        e["_iqama_alert"] = _expiry_status(e.get("iqama_expiry", ""))
-        e["_passport_alert"] = _expiry_status(e.get("passport_expiry", ""))
+    today = date.today().toordinal()
+    # Expiry alerts are relative to today, so the day is part of the validator
+    etag = weak_etag(request.url.path, org_unit_id, expiry, today, file_version(EMPLOYEES_FILE, ORG_UNITS_FILE))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    emps, org_units = await asyncio.gather(
+        asyncio.to_thread(load_employees),
+        asyncio.to_thread(_load_json, ORG_UNITS_FILE),
+    )
+    # Annotate copies; the loaded records are shared with the cache
+    emps = [
+        {**e, "_iqama_alert": _expiry_status(e.get("iqama_expiry", ""), today), "_passport_alert": _expiry_status(e.get("passport_expiry", ""), today)}
+        for e in emps
+    ]
     # Optional filtering by org unit and iqama expiry status
     if org_unit_id:
         emps = [e for e in emps if (e.get("org_unit_id") or "") == org_unit_id]
     if expiry in {"expired", "soon", "ok"}:
         emps = [e for e in emps if (e.get("_iqama_alert", {}).get("status") == expiry)]
-    # Load org units for filter dropdown
-    try:
-        org_units = json.loads(ORG_UNITS_FILE.read_text(encoding="utf-8"))
-    except Exception:
-        org_units = []
-    tpl = templates_env.get_template("employees_list.html")
-    return HTMLResponse(tpl.render(request=request, employees=emps, org_units=org_units, selected_org_unit=org_unit_id or "", selected_expiry=expiry or ""))
+    return stream_template(
+        _TPL_EMPLOYEES_LIST,
+        headers=cache_headers(etag),
+        request=request, employees=emps, org_units=org_units, selected_org_unit=org_unit_id or "", selected_expiry=expiry or "",
+    )
 
 
 @router.get("/new", response_class=HTMLResponse)
 async def employees_new(request: Request):
-    tpl = templates_env.get_template("employees_new.html")
-    return HTMLResponse(tpl.render(request=request))
+    return HTMLResponse(_TPL_EMPLOYEES_NEW.render(request=request))
+
+
+class NewEmployeeForm(BaseModel):
+    emp_id: str = ""
+    name: str = ""
+    nationality: str = ""
+    hire_date: str = ""
+    base_salary: float = 0.0
+    hra: float = 0.0  # ignored; recomputed from base_salary
+    transport: float = 0.0  # ignored; recomputed from base_salary
+    contract_type: str = "indefinite"
+    monthly_paid: bool = True
+    iqama_number: str = ""
+    iqama_expiry: str = ""
+    passport_number: str = ""
+    passport_expiry: str = ""
 
 
 @router.post("/")
-async def employees_create(
-    emp_id: str = Form(""),
-    name: str = Form(""),
-    nationality: str = Form(""),
-    hire_date: str = Form(""),
-    base_salary: float = Form(0.0),
-    hra: float = Form(0.0),
-    transport: float = Form(0.0),
-    contract_type: str = Form("indefinite"),
-    monthly_paid: bool = Form(True),
-    iqama_number: str = Form(""),
-    iqama_expiry: str = Form(""),
-    passport_number: str = Form(""),
-    passport_expiry: str = Form(""),
-):
-    emps = load_employees()
-    if not any(e.get("emp_id") == emp_id for e in emps):
-        # Server-side enforce allowance calculation
-        computed_hra = round(float(base_salary) * 0.25, 2)
-        computed_transport = round(float(base_salary) * 0.10, 2)
-        emps.append({
-            "emp_id": emp_id.strip(),
-            "name": name.strip(),
-            "nationality": nationality.strip(),
-            "hire_date": hire_date.strip(),
-            "base_salary": float(base_salary),
-            "hra": computed_hra,
-            "transport": computed_transport,
-            "contract_type": contract_type,
-            "monthly_paid": bool(monthly_paid),
-            "org_unit_id": None,
-            "position_id": None,
-            "iqama_number": iqama_number.strip(),
-            "iqama_expiry": iqama_expiry.strip(),
-            "passport_number": passport_number.strip(),
-            "passport_expiry": passport_expiry.strip(),
-        })
-        save_employees(emps)
+async def employees_create(form: Annotated[NewEmployeeForm, Form()]):
+    # Server-side enforce allowance calculation
+    computed_hra = round(form.base_salary * 0.25, 2)
+    computed_transport = round(form.base_salary * 0.10, 2)
+    await asyncio.to_thread(_add_employee, {
+        "emp_id": form.emp_id.strip(),
+        "name": form.name.strip(),
+        "nationality": form.nationality.strip(),
+        "hire_date": form.hire_date.strip(),
+        "base_salary": form.base_salary,
+        "hra": computed_hra,
+        "transport": computed_transport,
+        "contract_type": form.contract_type,
+        "monthly_paid": form.monthly_paid,
+        "org_unit_id": None,
+        "position_id": None,
+        "iqama_number": form.iqama_number.strip(),
+        "iqama_expiry": form.iqama_expiry.strip(),
+        "passport_number": form.passport_number.strip(),
+        "passport_expiry": form.passport_expiry.strip(),
+    })
     return RedirectResponse(url="/employees", status_code=303)
 
 
 @router.get("/{emp_id}", response_class=HTMLResponse)
 async def employees_detail(request: Request, emp_id: str):
-    emp = next((e for e in load_employees() if e.get("emp_id") == emp_id), None)
+    emp, org_units, positions = await asyncio.gather(
+        asyncio.to_thread(get_employee, emp_id),
+        asyncio.to_thread(_load_json, ORG_UNITS_FILE),
+        asyncio.to_thread(_load_json, POSITIONS_FILE),
+    )
     if not emp:
         return HTMLResponse("Employee not found", status_code=404)
-    org_units = _load_json(ORG_UNITS_FILE)
-    positions = _load_json(POSITIONS_FILE)
-    # Identity expiry alerts
-    def _days_until(dstr: str) -> int | None:
-        try:
-            d = datetime.strptime(dstr.strip(), "%Y-%m-%d").date()
-            return (d - date.today()).days
-        except Exception:
-            return None
-    def _expiry_status(dstr: str, threshold: int = 60) -> dict:
-        days = _days_until(dstr)
-        if days is None:
-            return {"status": "unknown", "days": None}
-        if days < 0:
-            return {"status": "expired", "days": days}
-        if days <= threshold:
-            return {"status": "soon", "days": days}
-        return {"status": "ok", "days": days}
     summary = {
         "years_of_service": round(years_of_service(emp.get("hire_date", "")), 2),
         "annual_leave_days": annual_leave_days(emp.get("hire_date", "")),
@@ -227,15 +336,16 @@ async def employees_detail(request: Request, emp_id: str):
         "max_weekly_hours": 48,
         "max_weekly_hours_ramadan": 36,
     }
-    tpl = templates_env.get_template("employees_detail.html")
-    iqama_alert = _expiry_status(emp.get("iqama_expiry", ""))
-    passport_alert = _expiry_status(emp.get("passport_expiry", ""))
-    return HTMLResponse(tpl.render(request=request, emp=emp, summary=summary, org_units=org_units, positions=positions, iqama_alert=iqama_alert, passport_alert=passport_alert))
+    # Identity expiry alerts
+    today = date.today().toordinal()
+    iqama_alert = _expiry_status(emp.get("iqama_expiry", ""), today)
+    passport_alert = _expiry_status(emp.get("passport_expiry", ""), today)
+    return HTMLResponse(_TPL_EMPLOYEES_DETAIL.render(request=request, emp=emp, summary=summary, org_units=org_units, positions=positions, iqama_alert=iqama_alert, passport_alert=passport_alert))
 
 
 @router.post("/{emp_id}/eos")
 async def employees_eos(emp_id: str, separation_date: str = Form(""), reason: str = Form("termination")):
-    emp = next((e for e in load_employees() if e.get("emp_id") == emp_id), None)
+    emp = await asyncio.to_thread(get_employee, emp_id)
     if not emp:
         return HTMLResponse("Employee not found", status_code=404)
     eos = compute_eos_benefit(float(emp.get("base_salary", 0.0)), emp.get("hire_date", ""), separation_date, reason)
@@ -244,7 +354,7 @@ async def employees_eos(emp_id: str, separation_date: str = Form(""), reason: st
 
 @router.post("/{emp_id}/overtime")
 async def employees_overtime(emp_id: str, hours: float = Form(0.0), day_type: str = Form("normal")):
-    emp = next((e for e in load_employees() if e.get("emp_id") == emp_id), None)
+    emp = await asyncio.to_thread(get_employee, emp_id)
     if not emp:
         return HTMLResponse("Employee not found", status_code=404)
     pay = compute_overtime_pay(float(emp.get("base_salary", 0.0)), float(hours), day_type)
@@ -253,41 +363,39 @@ async def employees_overtime(emp_id: str, hours: float = Form(0.0), day_type: st
 
 @router.post("/{emp_id}/assign_position")
 async def employees_assign_position(emp_id: str, org_unit_id: str = Form(""), position_id: str = Form("")):
-    emps = load_employees()
-    org_units = _load_json(ORG_UNITS_FILE)
-    positions = _load_json(POSITIONS_FILE)
-    emp = next((e for e in emps if e.get("emp_id") == emp_id), None)
-    if not emp:
-        return HTMLResponse("Employee not found", status_code=404)
+    org_units, positions = await asyncio.gather(
+        asyncio.to_thread(_load_json, ORG_UNITS_FILE),
+        asyncio.to_thread(_load_json, POSITIONS_FILE),
+    )
     # Validate IDs
     ou_valid = org_unit_id and any(u.get("id") == org_unit_id for u in org_units)
     pos_valid = position_id and any(p.get("id") == position_id for p in positions)
-    emp["org_unit_id"] = org_unit_id if ou_valid else None
-    emp["position_id"] = position_id if pos_valid else None
-    save_employees(emps)
+    changes = {
+        "org_unit_id": org_unit_id if ou_valid else None,
+        "position_id": position_id if pos_valid else None,
+    }
+    if not await asyncio.to_thread(_update_employee, emp_id, changes):
+        return HTMLResponse("Employee not found", status_code=404)
     return RedirectResponse(url=f"/employees/{emp_id}", status_code=303)
 
 
 @router.post("/{emp_id}/identity")
 async def employees_update_identity(
-    request: Request,
     emp_id: str,
     iqama_number: str = Form(""),
     iqama_expiry: str = Form(""),
     passport_number: str = Form(""),
     passport_expiry: str = Form(""),
+    denied: Optional[Response] = Depends(_HR_ADMIN),
 ):
-    denied = require_roles(request, ["admin", "hr"])
     if denied:
         return denied
-    emps = load_employees()
-    emp = next((e for e in emps if e.get("emp_id") == emp_id), None)
-    if not emp:
+    changes = {
+        "iqama_number": iqama_number.strip(),
+        "iqama_expiry": iqama_expiry.strip(),
+        "passport_number": passport_number.strip(),
+        "passport_expiry": passport_expiry.strip(),
+    }
+    if not await asyncio.to_thread(_update_employee, emp_id, changes):
         return HTMLResponse("Employee not found", status_code=404)
-    emp["iqama_number"] = iqama_number.strip()
-    emp["iqama_expiry"] = iqama_expiry.strip()
-    emp["passport_number"] = passport_number.strip()
-    emp["passport_expiry"] = passport_expiry.strip()
-    save_employees(emps)
     return RedirectResponse(url=f"/employees/{emp_id}", status_code=303)
-from .auth import require_roles
\ No newline at end of file
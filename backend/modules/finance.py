@@ -1,25 +1,75 @@
-import json
+import bisect
 import os
+import threading
+import time
+from collections import defaultdict
 from datetime import datetime
-from typing import List, Dict, Optional
+from pathlib import Path
+from typing import Any, List, Dict, Optional
 
 from fastapi import APIRouter, Request, Form
-from fastapi.responses import RedirectResponse
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import HTMLResponse, RedirectResponse
+
+from .. import jsonio
+from ..templating import templates_env
 
 
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
 CHART_FILE = os.path.join(DATA_DIR, "chart_of_accounts.json")
-JOURNAL_FILE = os.path.join(DATA_DIR, "journal_entries.json")
+# One JSON object per line, so posting an entry is a single append
+JOURNAL_FILE = os.path.join(DATA_DIR, "journal_entries.jsonl")
+LEGACY_JOURNAL_FILE = os.path.join(DATA_DIR, "journal_entries.json")
 BUDGETS_FILE = os.path.join(DATA_DIR, "budgets.json")
 TAX_SETTINGS_FILE = os.path.join(DATA_DIR, "tax_settings.json")
 TAX_FILINGS_FILE = os.path.join(DATA_DIR, "tax_filings.json")
 STOCK_MOVES_FILE = os.path.join(DATA_DIR, "stock_moves.json")
+BANK_ACCOUNTS_FILE = os.path.join(DATA_DIR, "bank_accounts.json")
+INVOICES_FILE = os.path.join(DATA_DIR, "invoices.json")
+PURCHASE_BILLS_FILE = os.path.join(DATA_DIR, "purchase_bills.json")
+
+_TPL_FINANCE_BALANCE_SHEET = templates_env.get_template("finance_balance_sheet.html")
+_TPL_FINANCE_BUDGET = templates_env.get_template("finance_budget.html")
+_TPL_FINANCE_BUDGET_NEW = templates_env.get_template("finance_budget_new.html")
+_TPL_FINANCE_COA = templates_env.get_template("finance_coa.html")
+_TPL_FINANCE_COA_DELETE = templates_env.get_template("finance_coa_delete.html")
+_TPL_FINANCE_COA_EDIT = templates_env.get_template("finance_coa_edit.html")
+_TPL_FINANCE_COA_NEW = templates_env.get_template("finance_coa_new.html")
+_TPL_FINANCE_JOURNAL_LIST = templates_env.get_template("finance_journal_list.html")
+_TPL_FINANCE_JOURNAL_NEW = templates_env.get_template("finance_journal_new.html")
+_TPL_FINANCE_LEDGER = templates_env.get_template("finance_ledger.html")
+_TPL_FINANCE_PL = templates_env.get_template("finance_pl.html")
+_TPL_FINANCE_TAX_FILING_NEW = templates_env.get_template("finance_tax_filing_new.html")
+_TPL_FINANCE_TAX_FILINGS = templates_env.get_template("finance_tax_filings.html")
+_TPL_FINANCE_TAX_OVERVIEW = templates_env.get_template("finance_tax_overview.html")
+_TPL_FINANCE_TAX_SETTINGS = templates_env.get_template("finance_tax_settings.html")
+_TPL_FINANCE_TRIAL_BALANCE = templates_env.get_template("finance_trial_balance.html")
+
+
+# Finance files are read whole; a 64 KiB buffer keeps a multi-MB journal down to
+# a handful of system calls.
+IO_BUFFER_SIZE = 64 * 1024
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb", buffering=IO_BUFFER_SIZE) as f:
+        return f.read()
 
-templates = Jinja2Templates(directory=os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates"))
+
+def _write_bytes(path: str, data: bytes):
+    # Serialize first, then write once to a temp file, fsync it and rename it over
+    # path, so neither a crash nor a concurrent reader ever sees a half-written file
+    jsonio.write_atomic(Path(path), data, fsync=True)
+
+
+# The files only have to be created once per process; after that every load can
+# skip the makedirs and exists() checks.
+_storage_ready = False
 
 
 def ensure_finance_storage():
+    global _storage_ready
+    if _storage_ready:
+        return
     os.makedirs(DATA_DIR, exist_ok=True)
     if not os.path.exists(CHART_FILE):
         # Seed a minimal chart of accounts
@@ -33,123 +83,418 @@ def ensure_finance_storage():
             {"code": "4000", "name": "Sales Revenue", "type": "income"},
             {"code": "5000", "name": "Cost of Goods Sold", "type": "expense"},
         ]
-        with open(CHART_FILE, "w", encoding="utf-8") as f:
-            json.dump(chart, f, indent=2)
+        _write_bytes(CHART_FILE, jsonio.dumps(chart))
     if not os.path.exists(JOURNAL_FILE):
-        with open(JOURNAL_FILE, "w", encoding="utf-8") as f:
-            json.dump([], f, indent=2)
+        _migrate_legacy_journal()
     if not os.path.exists(BUDGETS_FILE):
-        with open(BUDGETS_FILE, "w", encoding="utf-8") as f:
-            json.dump([], f, indent=2)
+        _write_bytes(BUDGETS_FILE, jsonio.dumps([]))
     if not os.path.exists(TAX_SETTINGS_FILE):
-        with open(TAX_SETTINGS_FILE, "w", encoding="utf-8") as f:
-            json.dump({"country_code": "", "gst_rate": None, "vat_rate": None, "tds_rates": {}, "gstin": "", "vat_number": "", "tds_tan": ""}, f, indent=2)
+        _write_bytes(TAX_SETTINGS_FILE, jsonio.dumps({"country_code": "", "gst_rate": None, "vat_rate": None, "tds_rates": {}, "gstin": "", "vat_number": "", "tds_tan": ""}))
     if not os.path.exists(TAX_FILINGS_FILE):
-        with open(TAX_FILINGS_FILE, "w", encoding="utf-8") as f:
-            json.dump([], f, indent=2)
+        _write_bytes(TAX_FILINGS_FILE, jsonio.dumps([]))
+    _storage_ready = True
+
+
+def _dump_jsonl(entries: List[Dict]) -> bytes:
+    return b"".join(jsonio.dumps(e, pretty=False) + b"\n" for e in entries)
+
+
+def _parse_jsonl(data: bytes) -> List[Dict]:
+    return [jsonio.loads(line) for line in data.splitlines() if line.strip()]
+
+
+# Legacy journal entries held in memory when the data dir is read-only and
+# journal_entries.json could not be converted; None once journal_entries.jsonl exists
+_legacy_journal: Optional[List[Dict]] = None
+
+
+def _migrate_legacy_journal():
+    """Convert journal_entries.json (one JSON array) into journal_entries.jsonl."""
+    global _legacy_journal
+    entries = []
+    if os.path.exists(LEGACY_JOURNAL_FILE):
+        entries = jsonio.loads(_read_bytes(LEGACY_JOURNAL_FILE))
+    try:
+        _write_bytes(JOURNAL_FILE, _dump_jsonl(entries))
+    except OSError:
+        # Read-only deploy: serve the legacy entries as they are and leave the file alone
+        for e in entries:
+            _normalize_lines(e.get("lines", []))
+        _legacy_journal = entries
+        return
+    if os.path.exists(LEGACY_JOURNAL_FILE):
+        os.remove(LEGACY_JOURNAL_FILE)
+
+
+# Decoded chart/journal files, keyed on each file's (mtime_ns, size) so a write by
+# another worker process is picked up on the next read.
+_cache: Dict[str, tuple] = {}
+_cache_lock = threading.Lock()
+
+# Handlers run in worker threads; this keeps concurrent read-modify-write cycles on
+# the chart, budgets and tax files from interleaving. Edits build a new object and
+# save that, so readers holding the cached one never see a half-applied change.
+_write_lock = threading.Lock()
+
+
+def _file_key(path: str) -> Optional[tuple]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    # The inode tells an in-place append apart from an atomic rewrite (a new file)
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+def _load_cached(path: str, parse=jsonio.loads, appendable: bool = False) -> Any:
+    """Parsed contents of path, reparsed only when the file changes.
+
+    For an appendable file (JSON lines), growth of the same file, e.g. another
+    worker posting entries, is handled by parsing just the new bytes.
+    """
+    key = _file_key(path)
+    with _cache_lock:
+        hit = _cache.get(path)
+        if hit is not None and key is not None:
+            old = hit[0]
+            if old == key:
+                return hit[1]
+            if appendable and old[2] == key[2] and old[1] < key[1]:
+                with open(path, "rb", buffering=IO_BUFFER_SIZE) as f:
+                    f.seek(old[1])
+                    tail = f.read(key[1] - old[1])
+                # A writer may be mid-line; parse whole lines only and resume at the
+                # last newline next time
+                end = tail.rfind(b"\n") + 1
+                data = hit[1]
+                if end:
+                    data.extend(parse(tail[:end]))
+                    _cache[path] = ((key[0], old[1] + end, key[2]), data)
+                return data
+        raw = _read_bytes(path)
+        if appendable and key is not None:
+            # Ignore anything appended since the stat and any partial last line, so
+            # the next tail read starts exactly where this parse stopped
+            raw = raw[:key[1]]
+            raw = raw[:raw.rfind(b"\n") + 1]
+            key = (key[0], len(raw), key[2])
+        data = parse(raw)
+        if key is not None:
+            _cache[path] = (key, data)
+        return data
+
+
+def _save_cached(path: str, data: Any, dump=jsonio.dumps):
+    with _cache_lock:
+        try:
+            _write_bytes(path, dump(data))
+        except Exception:
+            _cache.pop(path, None)  # in-memory edits may no longer match the file
+            raise
+        key = _file_key(path)
+        if key is None:
+            _cache.pop(path, None)
+        else:
+            _cache[path] = (key, data)
 
 
 def load_chart() -> List[Dict]:
+    """Chart of accounts. The list is cached and shared, so treat it as read-only and
+    save an edited copy with save_chart()."""
     ensure_finance_storage()
-    with open(CHART_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return _load_cached(CHART_FILE)
 
 
 def save_chart(chart: List[Dict]):
-    with open(CHART_FILE, "w", encoding="utf-8") as f:
-        json.dump(chart, f, indent=2)
+    _save_cached(CHART_FILE, chart)
+
+
+# {code: account}, {type: [accounts in code order]} and {code: type} over the
+# cached chart, keyed on the chart file version they were built from
+_chart_index_cache: Optional[tuple] = None
+
+
+def _chart_indexes() -> tuple:
+    global _chart_index_cache
+    key = _file_key(CHART_FILE)
+    cached = _chart_index_cache
+    if cached is not None and key is not None and cached[0] == key:
+        return cached[1]
+    index = {}
+    by_type = defaultdict(list)
+    type_by_code = {}
+    for a in load_chart():
+        index.setdefault(a.get("code"), a)
+        by_type[a.get("type")].append(a)
+        type_by_code[a.get("code")] = a.get("type")
+    indexes = (index, dict(by_type), type_by_code)
+    if key is not None:
+        _chart_index_cache = (key, indexes)
+    return indexes
+
+
+def chart_index() -> Dict[str, Dict]:
+    return _chart_indexes()[0]
+
+
+def accounts_by_type(atype: str) -> List[Dict]:
+    return _chart_indexes()[1].get(atype, [])
+
+
+def account_types() -> Dict[str, str]:
+    return _chart_indexes()[2]
+
+
+def _normalize_lines(lines: List[Dict]):
+    """Store debit/credit as floats so readers can use them without coercion."""
+    for l in lines:
+        l["debit"] = float(l.get("debit", 0) or 0)
+        l["credit"] = float(l.get("credit", 0) or 0)
+
+
+def _normalized_lines(lines: List[Dict]) -> List[Dict]:
+    """Copies of lines with float debit/credit; the caller's dicts are left as they are."""
+    return [
+        {**l, "debit": float(l.get("debit", 0) or 0), "credit": float(l.get("credit", 0) or 0)}
+        for l in lines
+    ]
+
+
+def _parse_journal(data: bytes) -> List[Dict]:
+    entries = _parse_jsonl(data)
+    # Entries written before amounts were normalized on posting may hold None or strings
+    for e in entries:
+        _normalize_lines(e.get("lines", []))
+    return entries
 
 
 def load_journals() -> List[Dict]:
+    """Journal entries, with line debit/credit always floats.
+
+    The list is cached and shared; it is only ever appended to, so treat it as
+    read-only and post through append_journal_entry().
+    """
     ensure_finance_storage()
-    with open(JOURNAL_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    if _legacy_journal is not None:
+        return _legacy_journal
+    return _load_cached(JOURNAL_FILE, _parse_journal, appendable=True)
 
 
 def save_journals(entries: List[Dict]):
-    with open(JOURNAL_FILE, "w", encoding="utf-8") as f:
-        json.dump(entries, f, indent=2)
+    for e in entries:
+        _normalize_lines(e.get("lines", []))
+    _save_cached(JOURNAL_FILE, entries, _dump_jsonl)
+
+
+# Appends waiting for the journal file. Whichever poster gets the file lock first
+# writes everything queued so far with one write and one fsync, so concurrent
+# posts share a disk flush instead of queueing up for one each.
+_pending_appends: List[Dict] = []
+_pending_lock = threading.Lock()
+
+
+def _write_journal_lines(entries: List[Dict]):
+    # Caller holds _cache_lock
+    data = _dump_jsonl(entries)
+    before = _file_key(JOURNAL_FILE)
+    try:
+        with open(JOURNAL_FILE, "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+    except Exception:
+        _cache.pop(JOURNAL_FILE, None)
+        raise
+    after = _file_key(JOURNAL_FILE)
+    hit = _cache.get(JOURNAL_FILE)
+    # Extend the cached list only if nobody else wrote to the file in between
+    if hit is not None and before is not None and after is not None and hit[0] == before and after[1] == before[1] + len(data):
+        hit[1].extend(entries)
+        _cache[JOURNAL_FILE] = (after, hit[1])
+    else:
+        _cache.pop(JOURNAL_FILE, None)
+
+
+def _append_journal_lines(entries: List[Dict]):
+    ticket = {"entries": entries, "done": False, "error": None}
+    with _pending_lock:
+        _pending_appends.append(ticket)
+    with _cache_lock:
+        # Another poster may have written this batch while we waited for the lock
+        if not ticket["done"]:
+            with _pending_lock:
+                batch = _pending_appends[:]
+                _pending_appends.clear()
+            try:
+                _write_journal_lines([e for t in batch for e in t["entries"]])
+            except Exception as exc:
+                for t in batch:
+                    t["error"] = exc
+            for t in batch:
+                t["done"] = True
+    if ticket["error"] is not None:
+        raise ticket["error"]
+
+
+def _account_code(a: Dict) -> str:
+    return a.get("code", "")
+
+
+def _insert_account(chart: List[Dict], account: Dict) -> List[Dict]:
+    """Copy of chart, which is kept sorted by code, with account inserted in place."""
+    i = bisect.bisect_right(chart, _account_code(account), key=_account_code)
+    return chart[:i] + [account] + chart[i:]
 
 
 def ensure_account(code: str, name: str, atype: str) -> str:
     """Ensure an account exists in the chart; create if missing."""
-    chart = load_chart()
-    if not any(a.get("code") == code for a in chart):
-        chart.append({"code": code, "name": name, "type": atype})
-        chart = sorted(chart, key=lambda a: a.get("code", ""))
-        save_chart(chart)
+    if code not in chart_index():
+        with _write_lock:
+            if code not in chart_index():
+                save_chart(_insert_account(load_chart(), {"code": code, "name": name, "type": atype}))
     return code
 
 
+def _add_accounts(accounts: List[Dict]) -> bool:
+    """Insert accounts into the chart with one save; False if a code is already taken."""
+    with _write_lock:
+        index = chart_index()
+        if any(a["code"] in index for a in accounts):
+            return False
+        chart = load_chart()
+        for a in accounts:
+            chart = _insert_account(chart, a)
+        save_chart(chart)
+    return True
+
+
+# {id: name} of the banking module's accounts, keyed on the file version it was built from
+_bank_names_cache: Optional[tuple] = None
+
+
+def _bank_account_names() -> Dict[str, str]:
+    global _bank_names_cache
+    key = _file_key(BANK_ACCOUNTS_FILE)
+    if key is None:
+        return {}
+    cached = _bank_names_cache
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    try:
+        bank_accounts = jsonio.loads(_read_bytes(BANK_ACCOUNTS_FILE))
+    except Exception:
+        bank_accounts = []
+    names = {a.get("id"): a.get("name") for a in bank_accounts}
+    _bank_names_cache = (key, names)
+    return names
+
+
 def _load_stock_moves() -> List[Dict]:
     try:
         if not os.path.exists(STOCK_MOVES_FILE):
             return []
-        with open(STOCK_MOVES_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return _load_cached(STOCK_MOVES_FILE)
     except Exception:
         return []
 
 
+# (moves list, {ref: [moves]}); the cached list is replaced whenever the file
+# changes, so posting several deliveries groups the moves only once
+_moves_by_ref_cache: Optional[tuple] = None
+
+
+def _stock_moves_by_ref() -> Dict[str, List[Dict]]:
+    global _moves_by_ref_cache
+    moves = _load_stock_moves()
+    cached = _moves_by_ref_cache
+    if cached is not None and cached[0] is moves:
+        return cached[1]
+    by_ref: Dict[str, List[Dict]] = defaultdict(list)
+    for m in moves:
+        by_ref[m.get("ref")].append(m)
+    by_ref = dict(by_ref)
+    _moves_by_ref_cache = (moves, by_ref)
+    return by_ref
+
+
 # --- Budgeting storage helpers ---
+# Like the chart and journals, these loaders return cached objects shared between
+# requests: annotate copies, and save edited copies with the matching save_*().
 def load_budgets() -> List[Dict]:
     ensure_finance_storage()
-    with open(BUDGETS_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return _load_cached(BUDGETS_FILE)
 
 
 def save_budgets(rows: List[Dict]):
-    with open(BUDGETS_FILE, "w", encoding="utf-8") as f:
-        json.dump(rows, f, indent=2)
+    _save_cached(BUDGETS_FILE, rows)
 
 
 # --- Tax storage helpers ---
 def load_tax_settings() -> Dict:
     ensure_finance_storage()
-    with open(TAX_SETTINGS_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return _load_cached(TAX_SETTINGS_FILE)
 
 
 def save_tax_settings(s: Dict):
-    with open(TAX_SETTINGS_FILE, "w", encoding="utf-8") as f:
-        json.dump(s, f, indent=2)
+    _save_cached(TAX_SETTINGS_FILE, s)
 
 
 def load_tax_filings() -> List[Dict]:
     ensure_finance_storage()
-    with open(TAX_FILINGS_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return _load_cached(TAX_FILINGS_FILE)
 
 
 def save_tax_filings(rows: List[Dict]):
-    with open(TAX_FILINGS_FILE, "w", encoding="utf-8") as f:
-        json.dump(rows, f, indent=2)
+    _save_cached(TAX_FILINGS_FILE, rows)
 
 
-def append_journal_entry(date: str, ref: str, memo: str, lines: List[Dict]) -> Dict:
+def append_journal_entry(date: str, ref: str, memo: str, lines: List[Dict], now: Optional[datetime] = None) -> Dict:
     """
     Append a balanced journal entry. Each line is: {account_code, debit, credit, memo?}
+    now stamps posted_at; callers posting a batch can pass one timestamp for all of it.
     """
-    # Validate balance
-    total_debit = sum(float(l.get("debit", 0) or 0) for l in lines)
-    total_credit = sum(float(l.get("credit", 0) or 0) for l in lines)
-    if round(total_debit, 2) != round(total_credit, 2):
-        raise ValueError("Journal entry is not balanced: debit != credit")
-
-    entries = load_journals()
-    entry = {
-        "date": date,
-        "ref": ref,
-        "memo": memo,
-        "lines": lines,
-        "posted_at": datetime.utcnow().isoformat(),
-    }
-    entries.append(entry)
-    save_journals(entries)
-    return entry
+    return append_journal_entries([{"date": date, "ref": ref, "memo": memo, "lines": lines}], now=now)[0]
 
 
-def account_by_code(chart: List[Dict], code: str) -> Optional[Dict]:
+def append_journal_entries(entries: List[Dict], now: Optional[datetime] = None) -> List[Dict]:
+    """
+    Append several balanced journal entries ({date, ref, memo, lines}) in one write.
+    Every entry is validated first, so an unbalanced one means nothing is posted.
+    """
+    posted_at = (now or datetime.utcnow()).isoformat()
+    posted = []
+    for e in entries:
+        lines = _normalized_lines(e["lines"])
+        # Validate balance
+        total_debit = sum(l["debit"] for l in lines)
+        total_credit = sum(l["credit"] for l in lines)
+        if round(total_debit, 2) != round(total_credit, 2):
+            raise ValueError("Journal entry is not balanced: debit != credit")
+        posted.append({
+            "date": e["date"],
+            "ref": e["ref"],
+            "memo": e["memo"],
+            "lines": lines,
+            "posted_at": posted_at,
+        })
+    if posted:
+        ensure_finance_storage()
+        _append_journal_lines(posted)
+    return posted
+
+
+def _post_or_batch(batch: Optional[List[Dict]], date: str, ref: str, memo: str, lines: List[Dict], now: datetime):
+    """Post the entry now, or queue it on batch for a later append_journal_entries()."""
+    if batch is None:
+        append_journal_entry(date=date, ref=ref, memo=memo, lines=lines, now=now)
+    else:
+        batch.append({"date": date, "ref": ref, "memo": memo, "lines": lines})
+
+
+def account_by_code(chart: Optional[List[Dict]], code: str) -> Optional[Dict]:
+    """Account with the given code; chart=None looks it up in the cached chart index."""
+    if chart is None:
+        return chart_index().get(code)
     for a in chart:
         if a.get("code") == code:
             return a
@@ -157,24 +502,27 @@ def account_by_code(chart: List[Dict], code: str) -> Optional[Dict]:
 
 
 def ledger_for_account(code: str) -> List[Dict]:
-    entries = load_journals()
+    summary = _summarize()
+    # Running balances are computed once per account per journal version
+    ledger = summary["ledgers"].get(code)
+    if ledger is not None:
+        return ledger
     ledger = []
     running = 0.0
-    for e in entries:
-        for line in e.get("lines", []):
-            if line.get("account_code") == code:
-                debit = float(line.get("debit", 0) or 0)
-                credit = float(line.get("credit", 0) or 0)
-                running = running + debit - credit
-                ledger.append({
-                    "date": e.get("date"),
-                    "ref": e.get("ref"),
-                    "entry_memo": e.get("memo"),
-                    "line_memo": line.get("memo", ""),
-                    "debit": debit,
-                    "credit": credit,
-                    "balance": round(running, 2),
-                })
+    for e, line in summary["lines_by_code"].get(code, ()):
+        debit = line["debit"]
+        credit = line["credit"]
+        running = running + debit - credit
+        ledger.append({
+            "date": e.get("date"),
+            "ref": e.get("ref"),
+            "entry_memo": e.get("memo"),
+            "line_memo": line.get("memo", ""),
+            "debit": debit,
+            "credit": credit,
+            "balance": round(running, 2),
+        })
+    summary["ledgers"][code] = ledger
     return ledger
 
 
@@ -183,20 +531,19 @@ def actual_for_period_account(period: str, account_code: Optional[str]) -> float
     Sum debit-credit for matching lines within the month. If account_code is None,
     include all expense/income accounts.
     """
-    # Parse period
-    try:
-        year, month = [int(x) for x in period.split("-")[:2]]
-    except Exception:
+    prefix = _period_prefix(period)
+    if prefix is None:
         return 0.0
-    entries = load_journals()
-    chart = load_chart()
-    type_by_code = {a.get("code"): a.get("type") for a in chart}
+    summary = _summarize()
+    # Budgets often share a period/account, so each pair is summed once per journal version
+    memo_key = (prefix, account_code or None)
+    actual = summary["actuals"].get(memo_key)
+    if actual is not None:
+        return actual
+    type_by_code = account_types()
     total = 0.0
-    for e in entries:
-        # e.get("date") can be YYYY-MM-DD; match year-month prefix
-        date_str = str(e.get("date") or "")
-        if not date_str.startswith(f"{year:04d}-{month:02d}"):
-            continue
+    # Only the entries dated in that month, from the summary's period index
+    for e in summary["by_period"].get(memo_key[0], ()):
         for l in e.get("lines", []):
             code = l.get("account_code")
             if account_code and code != account_code:
@@ -205,67 +552,116 @@ def actual_for_period_account(period: str, account_code: Optional[str]) -> float
                 # only consider income/expense
                 if type_by_code.get(code) not in ("income", "expense"):
                     continue
-            debit = float(l.get("debit", 0) or 0)
-            credit = float(l.get("credit", 0) or 0)
+            debit = l["debit"]
+            credit = l["credit"]
             # For expense, debit increases; for income, credit increases.
             sign = 1.0 if type_by_code.get(code) == "expense" else -1.0
             total += sign * (debit - credit)
-    return round(total, 2)
+    actual = summary["actuals"][memo_key] = round(total, 2)
+    return actual
 
 
-def period_matches(date_iso: str, period: str) -> bool:
+def _period_prefix(period: str) -> Optional[str]:
+    """YYYY-MM for a period like "2024-3" or "2024-03-15"; None if it does not parse."""
     try:
         year, month = [int(x) for x in period.split("-")[:2]]
     except Exception:
-        return False
-    return str(date_iso or "").startswith(f"{year:04d}-{month:02d}")
+        return None
+    return f"{year:04d}-{month:02d}"
 
 
-def trial_balance() -> List[Dict]:
-    chart = load_chart()
-    balances: Dict[str, Dict] = {a["code"]: {"code": a["code"], "name": a["name"], "type": a["type"], "debit": 0.0, "credit": 0.0} for a in chart}
-    entries = load_journals()
-    for e in entries:
+def period_matches(date_iso: str, period: str) -> bool:
+    prefix = _period_prefix(period)
+    return prefix is not None and str(date_iso or "").startswith(prefix)
+
+
+# Last _summarize() result, keyed on the chart and journal file versions it was built from
+_summary_cache: Optional[tuple] = None
+
+
+def _summarize() -> Dict:
+    """Trial balance, P&L, balance sheet and journal indexes (by account, by month) from one pass."""
+    global _summary_cache
+    # Take the key before reading so a concurrent write can only cause a recompute
+    key = (_file_key(CHART_FILE), _file_key(JOURNAL_FILE) if _legacy_journal is None else "legacy")
+    cached = _summary_cache
+    if cached is not None and None not in key and cached[0] == key:
+        return cached[1]
+
+    # Group-by-sum over the journal lines first, then merge the totals with the chart.
+    # Each group also keeps its (entry, line) pairs in journal order for the ledger.
+    groups: Dict[str, list] = {}
+    by_period: Dict[str, List[Dict]] = defaultdict(list)
+    for e in load_journals():
+        # e.get("date") can be YYYY-MM-DD; bucket entries by their year-month prefix
+        by_period[str(e.get("date") or "")[:7]].append(e)
         for l in e.get("lines", []):
             code = l.get("account_code")
-            debit = float(l.get("debit", 0) or 0)
-            credit = float(l.get("credit", 0) or 0)
-            acct = balances.get(code)
-            if acct:
-                acct["debit"] += debit
-                acct["credit"] += credit
-    # Compute net for display convenience
+            group = groups.get(code)
+            if group is None:
+                group = groups[code] = [0.0, 0.0, []]
+            group[0] += l["debit"]
+            group[1] += l["credit"]
+            group[2].append((e, l))
+    accounts: Dict[str, Dict] = {a["code"]: a for a in load_chart()}
+    # Compute net for display convenience, bucketing the report totals as we go
     tb = []
-    for b in balances.values():
-        net = round(b["debit"] - b["credit"], 2)
-        tb.append({**b, "net": net})
-    return tb
+    income = expense = assets = liabilities = equity = 0
+    for code, a in accounts.items():
+        debit, credit, _ = groups.get(code, (0.0, 0.0, None))
+        net = round(debit - credit, 2)
+        t = a["type"]
+        tb.append({"code": code, "name": a["name"], "type": t, "debit": debit, "credit": credit, "net": net})
+        if t == "income":
+            if net < 0:
+                income += -net
+        elif t == "expense":
+            if net > 0:
+                expense += net
+        elif t == "asset":
+            assets += net
+        elif t == "liability":
+            if net < 0:
+                liabilities += -net
+        elif t == "equity":
+            if net < 0:
+                equity += -net
+    summary = {
+        "tb": tb,
+        "pl": {
+            "income": round(income, 2),
+            "expense": round(expense, 2),
+            "net_income": round(income - expense, 2),
+        },
+        "bs": {
+            "assets": round(assets, 2),
+            "liabilities": round(liabilities, 2),
+            "equity": round(equity, 2),
+        },
+        "used": frozenset(groups),  # every account_code referenced by a journal line
+        "lines_by_code": {code: g[2] for code, g in groups.items()},
+        "ledgers": {},  # filled in lazily by ledger_for_account()
+        "actuals": {},  # filled in lazily by actual_for_period_account()
+        "by_period": dict(by_period),
+    }
+    if None not in key:
+        _summary_cache = (key, summary)
+    return summary
+
+
+def trial_balance() -> List[Dict]:
+    return _summarize()["tb"]
 
 
 def profit_and_loss() -> Dict[str, float]:
-    tb = trial_balance()
-    income = sum(-row["net"] for row in tb if row["type"] == "income" and row["net"] < 0)
-    expense = sum(row["net"] for row in tb if row["type"] == "expense" and row["net"] > 0)
-    return {
-        "income": round(income, 2),
-        "expense": round(expense, 2),
-        "net_income": round(income - expense, 2),
-    }
+    return _summarize()["pl"]
 
 
 def balance_sheet() -> Dict[str, float]:
-    tb = trial_balance()
-    assets = sum(row["net"] for row in tb if row["type"] == "asset")
-    liabilities = sum(-row["net"] for row in tb if row["type"] == "liability" and row["net"] < 0)
-    equity = sum(-row["net"] for row in tb if row["type"] == "equity" and row["net"] < 0)
-    return {
-        "assets": round(assets, 2),
-        "liabilities": round(liabilities, 2),
-        "equity": round(equity, 2),
-    }
+    return _summarize()["bs"]
 
 
-def post_invoice_to_gl(invoice: Dict):
+def post_invoice_to_gl(invoice: Dict, now: Optional[datetime] = None, batch: Optional[List[Dict]] = None):
     """Post a sales invoice to GL: DR AR, CR Revenue, CR VAT Payable."""
     subtotal = float(invoice.get("subtotal", 0))
     tax_rate = float(invoice.get("tax_rate", 0))
@@ -273,47 +669,57 @@ def post_invoice_to_gl(invoice: Dict):
     total = round(subtotal + vat, 2)
     customer = invoice.get("customer")
     ref = f"INV-{invoice.get('id')}"
-    date = invoice.get("date") or datetime.utcnow().date().isoformat()
+    now = now or datetime.utcnow()
+    date = invoice.get("date") or now.date().isoformat()
     memo = f"Invoice {invoice.get('id')} for {customer}"
     lines = [
         {"account_code": "1100", "debit": total, "credit": 0.0, "memo": f"AR {customer}"},
         {"account_code": "4000", "debit": 0.0, "credit": subtotal, "memo": "Sales revenue"},
         {"account_code": "2100", "debit": 0.0, "credit": vat, "memo": "VAT payable"},
     ]
-    append_journal_entry(date=date, ref=ref, memo=memo, lines=lines)
+    _post_or_batch(batch, date, ref, memo, lines, now)
 
 
-def post_payment_to_gl(payment: Dict):
-    """Post a payment: DR Cash/Bank, CR AR."""
+def _post_cash_movement(payment: Dict, *, cash_is_debit: bool, counter_code: str, counter_memo: str, ref: str, memo: str, now: Optional[datetime] = None, batch: Optional[List[Dict]] = None):
+    """Post a two-line cash/bank movement against counter_code.
+
+    Money in debits Cash/Bank and credits the counter account; money out does the
+    reverse. The debit line is always written first.
+    """
     amount = float(payment.get("amount", 0))
     method = (payment.get("method") or "cash").lower()
-    account_code = "1000" if method == "cash" else "1010"
+    cash_code = "1000" if method == "cash" else "1010"
     bank_account_id = payment.get("bank_account_id")
-    bank_accounts_file = os.path.join(DATA_DIR, "bank_accounts.json")
-    bank_accounts = []
-    try:
-        if os.path.exists(bank_accounts_file):
-            with open(bank_accounts_file, "r", encoding="utf-8") as f:
-                bank_accounts = json.load(f)
-    except Exception:
-        bank_accounts = []
-    acct_name_map = {a.get("id"): a.get("name") for a in bank_accounts}
-    customer = payment.get("customer")
-    invoice_id = payment.get("invoice_id")
-    ref = f"PAY-{payment.get('id')}"
-    date = payment.get("date") or datetime.utcnow().date().isoformat()
-    memo = f"Payment {payment.get('id')} from {customer}"
+    now = now or datetime.utcnow()
+    date = payment.get("date") or now.date().isoformat()
     method_memo = f"Payment {method}"
     if method == "bank" and bank_account_id:
-        method_memo = f"Payment bank • {acct_name_map.get(bank_account_id) or bank_account_id}"
+        method_memo = f"Payment bank • {_bank_account_names().get(bank_account_id) or bank_account_id}"
+    cash = (cash_code, method_memo)
+    counter = (counter_code, counter_memo)
+    (dr_code, dr_memo), (cr_code, cr_memo) = (cash, counter) if cash_is_debit else (counter, cash)
     lines = [
-        {"account_code": account_code, "debit": amount, "credit": 0.0, "memo": method_memo},
-        {"account_code": "1100", "debit": 0.0, "credit": amount, "memo": f"AR settle INV-{invoice_id}"},
+        {"account_code": dr_code, "debit": amount, "credit": 0.0, "memo": dr_memo},
+        {"account_code": cr_code, "debit": 0.0, "credit": amount, "memo": cr_memo},
     ]
-    append_journal_entry(date=date, ref=ref, memo=memo, lines=lines)
+    _post_or_batch(batch, date, ref, memo, lines, now)
+
+
+def post_payment_to_gl(payment: Dict, now: Optional[datetime] = None, batch: Optional[List[Dict]] = None):
+    """Post a payment: DR Cash/Bank, CR AR."""
+    _post_cash_movement(
+        payment,
+        cash_is_debit=True,
+        counter_code="1100",
+        counter_memo=f"AR settle INV-{payment.get('invoice_id')}",
+        ref=f"PAY-{payment.get('id')}",
+        memo=f"Payment {payment.get('id')} from {payment.get('customer')}",
+        now=now,
+        batch=batch,
+    )
 
 
-def post_purchase_bill_to_gl(bill: Dict):
+def post_purchase_bill_to_gl(bill: Dict, now: Optional[datetime] = None, batch: Optional[List[Dict]] = None):
     """Post a purchase bill to GL: DR Inventory, DR VAT Payable (decrease), CR AP."""
     subtotal = float(bill.get("subtotal", 0))
     tax_rate = float(bill.get("tax_rate", 0))
@@ -321,7 +727,8 @@ def post_purchase_bill_to_gl(bill: Dict):
     total = round(subtotal + vat, 2)
     vendor = bill.get("vendor")
     ref = f"BILL-{bill.get('id')}"
-    date = bill.get("date") or datetime.utcnow().date().isoformat() # no change
+    now = now or datetime.utcnow()
+    date = bill.get("date") or now.date().isoformat()
     memo = f"Bill {bill.get('id')} from {vendor}"
     # Ensure Inventory account exists
     ensure_account("1200", "Inventory", "asset")
@@ -330,26 +737,26 @@ def post_purchase_bill_to_gl(bill: Dict):
         {"account_code": "2100", "debit": vat, "credit": 0.0, "memo": "VAT receivable"},
         {"account_code": "2000", "debit": 0.0, "credit": total, "memo": f"AP {vendor}"},
     ]
-    append_journal_entry(date=date, ref=ref, memo=memo, lines=lines)
+    _post_or_batch(batch, date, ref, memo, lines, now)
 
 
-def post_delivery_to_gl(delivery: Dict):
+def post_delivery_to_gl(delivery: Dict, now: Optional[datetime] = None, batch: Optional[List[Dict]] = None):
     """Post a delivery note to GL: DR COGS, CR Inventory using recorded stock moves."""
     # Ensure necessary accounts exist
     ensure_account("1200", "Inventory", "asset")
     ensure_account("5000", "Cost of Goods Sold", "expense")
 
     ref = f"DEL-{delivery.get('id')}"
-    date = delivery.get("date") or datetime.utcnow().date().isoformat()
+    now = now or datetime.utcnow()
+    date = delivery.get("date") or now.date().isoformat()
     customer = delivery.get("customer")
     memo = f"Delivery {delivery.get('id')} to {customer}"
 
     # Sum COGS from recorded 'out' moves for this delivery
-    moves = _load_stock_moves()
     cogs_total = 0.0
-    for m in moves:
+    for m in _stock_moves_by_ref().get(ref, ()):
         try:
-            if m.get("ref") == ref and (m.get("type") or "") == "out":
+            if (m.get("type") or "") == "out":
                 qty = float(m.get("quantity", 0) or 0)
                 unit_cost = float(m.get("unit_cost", 0) or 0)
                 cogs_total += qty * unit_cost
@@ -364,52 +771,64 @@ def post_delivery_to_gl(delivery: Dict):
         {"account_code": "5000", "debit": cogs_total, "credit": 0.0, "memo": "COGS from delivery"},
         {"account_code": "1200", "debit": 0.0, "credit": cogs_total, "memo": "Inventory reduction"},
     ]
-    append_journal_entry(date=date, ref=ref, memo=memo, lines=lines)
+    _post_or_batch(batch, date, ref, memo, lines, now)
 
 
-def post_purchase_payment_to_gl(payment: Dict):
+def post_purchase_payment_to_gl(payment: Dict, now: Optional[datetime] = None, batch: Optional[List[Dict]] = None):
     """Post a payment to supplier: DR AP, CR Cash/Bank."""
-    amount = float(payment.get("amount", 0))
-    method = (payment.get("method") or "cash").lower()
-    cash_code = "1000" if method == "cash" else "1010"
-    bank_account_id = payment.get("bank_account_id")
-    bank_accounts_file = os.path.join(DATA_DIR, "bank_accounts.json")
-    bank_accounts = []
-    try:
-        if os.path.exists(bank_accounts_file):
-            with open(bank_accounts_file, "r", encoding="utf-8") as f:
-                bank_accounts = json.load(f)
-    except Exception:
-        bank_accounts = []
-    acct_name_map = {a.get("id"): a.get("name") for a in bank_accounts}
-    vendor = payment.get("vendor")
-    bill_id = payment.get("bill_id")
-    ref = f"PPAY-{payment.get('id')}"
-    date = payment.get("date") or datetime.utcnow().date().isoformat()
-    memo = f"Payment {payment.get('id')} to {vendor}"
-    method_memo = f"Payment {method}"
-    if method == "bank" and bank_account_id:
-        method_memo = f"Payment bank • {acct_name_map.get(bank_account_id) or bank_account_id}"
-    lines = [
-        {"account_code": "2000", "debit": amount, "credit": 0.0, "memo": f"AP settle BILL-{bill_id}"},
-        {"account_code": cash_code, "debit": 0.0, "credit": amount, "memo": method_memo},
-    ]
-    append_journal_entry(date=date, ref=ref, memo=memo, lines=lines)
+    _post_cash_movement(
+        payment,
+        cash_is_debit=False,
+        counter_code="2000",
+        counter_memo=f"AP settle BILL-{payment.get('bill_id')}",
+        ref=f"PPAY-{payment.get('id')}",
+        memo=f"Payment {payment.get('id')} to {payment.get('vendor')}",
+        now=now,
+        batch=batch,
+    )
+
+
+def post_invoices_to_gl(invoices: List[Dict], now: Optional[datetime] = None):
+    """Post many invoices (e.g. a bulk import) with a single journal append."""
+    now = now or datetime.utcnow()
+    batch: List[Dict] = []
+    for invoice in invoices:
+        post_invoice_to_gl(invoice, now=now, batch=batch)
+    append_journal_entries(batch, now=now)
+
+
+# (whole second, its "YYYY-MM-DDTHH:MM:SSZ" form); created_at stamps only have second
+# precision, so every record created within the same second reuses one string
+_now_iso_cache: tuple = (None, "")
+
+
+def _now_iso() -> str:
+    global _now_iso_cache
+    sec = int(time.time())
+    cached = _now_iso_cache
+    if cached[0] == sec:
+        return cached[1]
+    stamp = datetime.utcfromtimestamp(sec).isoformat(timespec="seconds") + "Z"
+    _now_iso_cache = (sec, stamp)
+    return stamp
 
 
 router = APIRouter(prefix="/accounting", tags=["Finance"])
 
+# Display order for the account-type pickers; the set is for validating form input
+ACCOUNT_TYPES = ("asset", "liability", "equity", "income", "expense")
+_ACCOUNT_TYPE_SET = frozenset(ACCOUNT_TYPES)
+
 
 @router.get("/coa")
 def chart_of_accounts_page(request: Request):
     chart = load_chart()
-    return templates.TemplateResponse("finance_coa.html", {"request": request, "chart": chart})
+    return HTMLResponse(_TPL_FINANCE_COA.render(request=request, chart=chart))
 
 
 @router.get("/coa/new")
 def chart_of_accounts_new(request: Request):
-    types = ["asset", "liability", "equity", "income", "expense"]
-    return templates.TemplateResponse("finance_coa_new.html", {"request": request, "types": types, "error": None})
+    return HTMLResponse(_TPL_FINANCE_COA_NEW.render(request=request, types=ACCOUNT_TYPES, error=None))
 
 
 @router.post("/coa")
@@ -425,49 +844,44 @@ def chart_of_accounts_create(
     code = (code or "").strip()
     name = (name or "").strip()
     type = (type or "").strip().lower()
-    types = ["asset", "liability", "equity", "income", "expense"]
-    if type not in types:
-        return templates.TemplateResponse("finance_coa_new.html", {"request": request, "types": types, "error": f"Invalid type '{type}'"})
-    chart = load_chart()
-    if any(a.get("code") == code for a in chart):
-        return templates.TemplateResponse("finance_coa_new.html", {"request": request, "types": types, "error": f"Account code '{code}' already exists"})
-    chart.append({"code": code, "name": name, "type": type})
-    chart = sorted(chart, key=lambda a: a.get("code", ""))
-    save_chart(chart)
+    if type not in _ACCOUNT_TYPE_SET:
+        return HTMLResponse(_TPL_FINANCE_COA_NEW.render(request=request, types=ACCOUNT_TYPES, error=f"Invalid type '{type}'"))
+    if code in chart_index():
+        return HTMLResponse(_TPL_FINANCE_COA_NEW.render(request=request, types=ACCOUNT_TYPES, error=f"Account code '{code}' already exists"))
+    account = {"code": code, "name": name, "type": type}
+    # Accounts to add; the chart is written once, after the form is fully validated
+    new_accounts = [account]
 
     # Optional opening balance journal posting
     try:
         amount_val = float(opening_balance_amount) if (opening_balance_amount or "").strip() != "" else 0.0
     except ValueError:
         amount_val = 0.0
+    lines = None
     if amount_val and amount_val > 0:
         side = (opening_balance_side or "").lower()
         if side not in ("debit", "credit"):
-            return templates.TemplateResponse(
-                "finance_coa_new.html",
-                {"request": request, "types": types, "error": "Select debit/credit for opening balance"}
-            )
-        # Determine offset equity account code
+            return HTMLResponse(_TPL_FINANCE_COA_NEW.render(
+                request=request, types=ACCOUNT_TYPES, error="Select debit/credit for opening balance",
+            ))
+        # Determine offset equity account code (the new account itself is a candidate)
         equity_code = None
-        preferred = next((a for a in chart if a.get("code") == "3000"), None)
-        if preferred:
-            equity_code = preferred["code"]
+        if code == "3000" or "3000" in chart_index():
+            equity_code = "3000"
         else:
-            eq = next((a for a in chart if a.get("type") == "equity"), None)
-            if eq:
-                equity_code = eq["code"]
+            # The chart is kept in code order, so the first equity account is the lowest
+            equities = accounts_by_type("equity")[:1]
+            if type == "equity":
+                equities.append(account)
+            if equities:
+                equity_code = min(equities, key=_account_code)["code"]
             else:
                 # Create an Opening Balances equity account if none exist
                 opening_equity = {"code": "3999", "name": "Opening Balances", "type": "equity"}
-                chart.append(opening_equity)
-                chart = sorted(chart, key=lambda a: a.get("code", ""))
-                save_chart(chart)
+                new_accounts.append(opening_equity)
                 equity_code = opening_equity["code"]
 
         # Compose balanced opening entry
-        as_of = opening_balance_date or datetime.utcnow().date().isoformat()
-        ref = f"OPEN-{code}"
-        memo = f"Opening balance for {code} {name}"
         if side == "debit":
             lines = [
                 {"account_code": code, "debit": amount_val, "credit": 0.0, "memo": "Opening balance"},
@@ -478,6 +892,13 @@ def chart_of_accounts_create(
                 {"account_code": code, "debit": 0.0, "credit": amount_val, "memo": "Opening balance"},
                 {"account_code": equity_code, "debit": amount_val, "credit": 0.0, "memo": "Offset opening balance"},
             ]
+
+    if not _add_accounts(new_accounts):
+        return HTMLResponse(_TPL_FINANCE_COA_NEW.render(request=request, types=ACCOUNT_TYPES, error=f"Account code '{code}' already exists"))
+    if lines:
+        as_of = opening_balance_date or datetime.utcnow().date().isoformat()
+        ref = f"OPEN-{code}"
+        memo = f"Opening balance for {code} {name}"
         append_journal_entry(date=as_of, ref=ref, memo=memo, lines=lines)
     return RedirectResponse(url="/accounting/coa", status_code=303)
 
@@ -485,18 +906,17 @@ def chart_of_accounts_create(
 @router.get("/journals")
 def journals_page(request: Request):
     entries = load_journals()
-    return templates.TemplateResponse("finance_journal_list.html", {"request": request, "entries": entries})
+    return HTMLResponse(_TPL_FINANCE_JOURNAL_LIST.render(request=request, entries=entries))
 
 
 @router.get("/journals/new")
 def journals_new_page(request: Request):
     chart = load_chart()
-    return templates.TemplateResponse("finance_journal_new.html", {"request": request, "chart": chart})
+    return HTMLResponse(_TPL_FINANCE_JOURNAL_NEW.render(request=request, chart=chart))
 
 
 @router.post("/journals")
 def journals_create(
-    request: Request,
     date: str = Form(...),
     ref: str = Form("MANUAL"),
     memo: str = Form("") ,
@@ -514,19 +934,22 @@ def journals_create(
 # --- Budgeting routes ---
 @router.get("/budget")
 def budget_list(request: Request):
-    budgets = load_budgets()
-    # Enrich with actuals and variance
-    for b in budgets:
+    # Enrich copies with actuals and variance; the loaded rows are the shared cache
+    budgets = []
+    for b in load_budgets():
         period = b.get("period")
         acct = b.get("account_code") or None
         actual = actual_for_period_account(period, acct)
-        b["actual"] = actual
         limit = float(b.get("limit", 0) or 0)
         forecast = float(b.get("forecast", 0) or 0)
-        b["variance_vs_limit"] = round(limit - actual, 2)
-        b["variance_vs_forecast"] = round(forecast - actual, 2)
+        budgets.append({
+            **b,
+            "actual": actual,
+            "variance_vs_limit": round(limit - actual, 2),
+            "variance_vs_forecast": round(forecast - actual, 2),
+        })
     chart = load_chart()
-    return templates.TemplateResponse("finance_budget.html", {"request": request, "budgets": budgets, "chart": chart})
+    return HTMLResponse(_TPL_FINANCE_BUDGET.render(request=request, budgets=budgets, chart=chart))
 
 
 @router.get("/budget/new")
@@ -534,76 +957,85 @@ def budget_new(request: Request):
     chart = load_chart()
     # limit to income/expense accounts for targeting (optional)
     accounts = [a for a in chart if a.get("type") in ("income", "expense")]
-    return templates.TemplateResponse("finance_budget_new.html", {"request": request, "accounts": accounts})
+    return HTMLResponse(_TPL_FINANCE_BUDGET_NEW.render(request=request, accounts=accounts))
 
 
 @router.post("/budget")
 def budget_create(
-    request: Request,
     name: str = Form(...),
     period: str = Form(...),  # YYYY-MM
     account_code: str = Form(""),
     limit: str = Form("0"),
     forecast: str = Form("0"),
 ):
-    budgets = load_budgets()
-    row = {
-        "id": f"BUD-{len(budgets)+1:05d}",
-        "name": (name or "").strip(),
-        "period": (period or "").strip(),
-        "account_code": (account_code or "").strip() or None,
-        "limit": float(limit or 0),
-        "forecast": float(forecast or 0),
-        "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
-    }
-    budgets.append(row)
-    save_budgets(budgets)
+    with _write_lock:
+        budgets = load_budgets()
+        row = {
+            "id": f"BUD-{len(budgets)+1:05d}",
+            "name": (name or "").strip(),
+            "period": (period or "").strip(),
+            "account_code": (account_code or "").strip() or None,
+            "limit": float(limit or 0),
+            "forecast": float(forecast or 0),
+            "created_at": _now_iso(),
+        }
+        save_budgets(budgets + [row])
     return RedirectResponse(url="/accounting/budget", status_code=303)
 
 
 # --- Tax Compliance routes ---
-@router.get("/tax")
-def tax_overview(request: Request, period: str = ""):
-    settings = load_tax_settings()
-    # default period: current YYYY-MM
-    if not period:
-        now = datetime.utcnow()
-        period = f"{now.year:04d}-{now.month:02d}"
+# ((invoices version, bills version), {YYYY-MM: [sales tax, purchase tax]}), so the
+# tax page only re-reads invoices and bills after one of them changes
+_tax_totals_cache: Optional[tuple] = None
+
+
+def _tax_totals_by_period() -> Dict[str, list]:
+    global _tax_totals_cache
+    key = (_file_key(INVOICES_FILE), _file_key(PURCHASE_BILLS_FILE))
+    cached = _tax_totals_cache
+    if cached is not None and None not in key and cached[0] == key:
+        return cached[1]
+    totals: Dict[str, list] = defaultdict(lambda: [0.0, 0.0])
     # Sales tax collected
-    sales_tax = 0.0
     try:
         from .sales import load_invoices as sales_load_invoices  # type: ignore
-        invoices = sales_load_invoices()
-        for inv in invoices:
-            if period_matches(inv.date, period):
-                sales_tax += float(inv.subtotal or 0.0) * float(inv.tax_rate or 0.0)
+        for inv in sales_load_invoices():
+            totals[str(inv.date or "")[:7]][0] += float(inv.subtotal or 0.0) * float(inv.tax_rate or 0.0)
     except Exception:
         pass
     # Purchase tax credit
-    purchase_tax = 0.0
     try:
         from .purchases import load_bills as purchases_load_bills  # type: ignore
-        bills = purchases_load_bills()
-        for b in bills:
-            if period_matches(b.date, period):
-                purchase_tax += float(b.subtotal or 0.0) * float(b.tax_rate or 0.0)
+        for b in purchases_load_bills():
+            totals[str(b.date or "")[:7]][1] += float(b.subtotal or 0.0) * float(b.tax_rate or 0.0)
     except Exception:
         pass
+    totals = dict(totals)
+    if None not in key:
+        _tax_totals_cache = (key, totals)
+    return totals
+
+
+@router.get("/tax")
+def tax_overview(request: Request, period: str = ""):
+    settings = load_tax_settings()
+    # default period: current YYYY-MM
+    if not period:
+        now = datetime.utcnow()
+        period = f"{now.year:04d}-{now.month:02d}"
+    sales_tax, purchase_tax = _tax_totals_by_period().get(_period_prefix(period), (0.0, 0.0))
     net_vat = round(sales_tax - purchase_tax, 2)
     filings = load_tax_filings()
     period_filings = [f for f in filings if f.get("period") == period]
-    return templates.TemplateResponse(
-        "finance_tax_overview.html",
-        {
-            "request": request,
-            "settings": settings,
-            "period": period,
-            "sales_tax": round(sales_tax, 2),
-            "purchase_tax": round(purchase_tax, 2),
-            "net_vat": net_vat,
-            "filings": period_filings,
-        },
-    )
+    return HTMLResponse(_TPL_FINANCE_TAX_OVERVIEW.render(
+        request=request,
+        settings=settings,
+        period=period,
+        sales_tax=round(sales_tax, 2),
+        purchase_tax=round(purchase_tax, 2),
+        net_vat=net_vat,
+        filings=period_filings,
+    ))
 
 
 @router.get("/tax/settings")
@@ -616,12 +1048,11 @@ def tax_settings_page(request: Request):
         {"code": "SA", "name": "Saudi Arabia", "taxes": ["VAT"]},
         {"code": "AE", "name": "United Arab Emirates", "taxes": ["VAT"]},
     ]
-    return templates.TemplateResponse("finance_tax_settings.html", {"request": request, "settings": settings, "countries": countries})
+    return HTMLResponse(_TPL_FINANCE_TAX_SETTINGS.render(request=request, settings=settings, countries=countries))
 
 
 @router.post("/tax/settings")
 def tax_settings_update(
-    request: Request,
     country_code: str = Form(""),
     gst_rate: str = Form(""),
     vat_rate: str = Form(""),
@@ -629,7 +1060,7 @@ def tax_settings_update(
     vat_number: str = Form(""),
     tds_tan: str = Form(""),
 ):
-    s = load_tax_settings()
+    s = dict(load_tax_settings())
     s["country_code"] = (country_code or "").upper()
     s["gst_rate"] = float(gstin and (gst_rate or 0) or (gst_rate or 0) or 0) if (gst_rate or "").strip() != "" else None
     s["vat_rate"] = float((vat_rate or 0) or 0) if (vat_rate or "").strip() != "" else None
@@ -637,60 +1068,53 @@ def tax_settings_update(
     s["vat_number"] = (vat_number or "").strip()
     s["tds_tan"] = (tds_tan or "").strip()
     # TDS rates can be edited separately (not in this simple form)
-    save_tax_settings(s)
+    with _write_lock:
+        save_tax_settings(s)
     return RedirectResponse(url="/accounting/tax/settings", status_code=303)
 
 
 @router.get("/tax/filings")
 def tax_filings_list(request: Request):
     filings = load_tax_filings()
-    return templates.TemplateResponse("finance_tax_filings.html", {"request": request, "filings": filings})
+    return HTMLResponse(_TPL_FINANCE_TAX_FILINGS.render(request=request, filings=filings))
 
 
 @router.get("/tax/filings/new")
 def tax_filings_new(request: Request):
-    return templates.TemplateResponse("finance_tax_filing_new.html", {"request": request})
+    return HTMLResponse(_TPL_FINANCE_TAX_FILING_NEW.render(request=request))
 
 
 @router.post("/tax/filings")
 def tax_filings_create(
-    request: Request,
     ftype: str = Form(...),  # gst, vat, tds
     period: str = Form(...),
     ref: str = Form(""),
     status: str = Form("draft"),  # draft, submitted, accepted, rejected
 ):
-    rows = load_tax_filings()
-    rows.append({
-        "id": f"TAX-{len(rows)+1:05d}",
-        "type": (ftype or "").lower(),
-        "period": (period or "").strip(),
-        "ref": (ref or "").strip(),
-        "status": (status or "").strip(),
-        "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
-    })
-    save_tax_filings(rows)
+    with _write_lock:
+        rows = load_tax_filings()
+        save_tax_filings(rows + [{
+            "id": f"TAX-{len(rows)+1:05d}",
+            "type": (ftype or "").lower(),
+            "period": (period or "").strip(),
+            "ref": (ref or "").strip(),
+            "status": (status or "").strip(),
+            "created_at": _now_iso(),
+        }])
     return RedirectResponse(url="/accounting/tax/filings", status_code=303)
 
 
 # --- GL Account edit/delete helpers and routes ---
 def account_in_use(code: str) -> bool:
-    entries = load_journals()
-    for e in entries:
-        for l in e.get("lines", []):
-            if l.get("account_code") == code:
-                return True
-    return False
+    return code in _summarize()["used"]
 
 
 @router.get("/coa/{code}/edit")
 def chart_of_accounts_edit(request: Request, code: str):
-    chart = load_chart()
-    acct = account_by_code(chart, code)
+    acct = account_by_code(None, code)
     if not acct:
         return RedirectResponse(url="/accounting/coa", status_code=303)
-    types = ["asset", "liability", "equity", "income", "expense"]
-    return templates.TemplateResponse("finance_coa_edit.html", {"request": request, "account": acct, "types": types, "error": None})
+    return HTMLResponse(_TPL_FINANCE_COA_EDIT.render(request=request, account=acct, types=ACCOUNT_TYPES, error=None))
 
 
 @router.post("/coa/{code}/edit")
@@ -700,64 +1124,62 @@ def chart_of_accounts_update(
     name: str = Form(...),
     type: str = Form(...),
 ):
-    chart = load_chart()
-    acct = account_by_code(chart, code)
+    acct = account_by_code(None, code)
     if not acct:
         return RedirectResponse(url="/accounting/coa", status_code=303)
-    types = ["asset", "liability", "equity", "income", "expense"]
     type_val = (type or "").strip().lower()
-    if type_val not in types:
-        return templates.TemplateResponse("finance_coa_edit.html", {"request": request, "account": acct, "types": types, "error": f"Invalid type '{type_val}'"})
-    acct["name"] = (name or "").strip()
-    acct["type"] = type_val
-    save_chart(sorted(chart, key=lambda a: a.get("code", "")))
+    if type_val not in _ACCOUNT_TYPE_SET:
+        return HTMLResponse(_TPL_FINANCE_COA_EDIT.render(request=request, account=acct, types=ACCOUNT_TYPES, error=f"Invalid type '{type_val}'"))
+    # Replace the account in a copy of the chart; the code is unchanged, so the list
+    # stays in order
+    edited = {**acct, "name": (name or "").strip(), "type": type_val}
+    with _write_lock:
+        save_chart([edited if a.get("code") == code else a for a in load_chart()])
     return RedirectResponse(url="/accounting/coa", status_code=303)
 
 
 @router.get("/coa/{code}/delete")
 def chart_of_accounts_delete_confirm(request: Request, code: str):
-    chart = load_chart()
-    acct = account_by_code(chart, code)
+    acct = account_by_code(None, code)
     if not acct:
         return RedirectResponse(url="/accounting/coa", status_code=303)
     in_use = account_in_use(code)
-    return templates.TemplateResponse("finance_coa_delete.html", {"request": request, "account": acct, "in_use": in_use, "error": None})
+    return HTMLResponse(_TPL_FINANCE_COA_DELETE.render(request=request, account=acct, in_use=in_use, error=None))
 
 
 @router.post("/coa/{code}/delete")
 def chart_of_accounts_delete(request: Request, code: str):
-    chart = load_chart()
-    acct = account_by_code(chart, code)
+    acct = account_by_code(None, code)
     if not acct:
         return RedirectResponse(url="/accounting/coa", status_code=303)
     if account_in_use(code):
-        return templates.TemplateResponse("finance_coa_delete.html", {"request": request, "account": acct, "in_use": True, "error": "Account is referenced in journals and cannot be deleted"})
-    new_chart = [a for a in chart if a.get("code") != code]
-    save_chart(sorted(new_chart, key=lambda a: a.get("code", "")))
+        return HTMLResponse(_TPL_FINANCE_COA_DELETE.render(request=request, account=acct, in_use=True, error="Account is referenced in journals and cannot be deleted"))
+    # Filtering keeps the remaining accounts in code order
+    with _write_lock:
+        save_chart([a for a in load_chart() if a.get("code") != code])
     return RedirectResponse(url="/accounting/coa", status_code=303)
 
 
 @router.get("/ledger/{account_code}")
 def ledger_page(request: Request, account_code: str):
-    chart = load_chart()
-    account = account_by_code(chart, account_code)
+    account = account_by_code(None, account_code)
     ledger = ledger_for_account(account_code)
-    return templates.TemplateResponse("finance_ledger.html", {"request": request, "account": account, "ledger": ledger})
+    return HTMLResponse(_TPL_FINANCE_LEDGER.render(request=request, account=account, ledger=ledger))
 
 
 @router.get("/trial-balance")
 def trial_balance_page(request: Request):
     tb = trial_balance()
-    return templates.TemplateResponse("finance_trial_balance.html", {"request": request, "tb": tb})
+    return HTMLResponse(_TPL_FINANCE_TRIAL_BALANCE.render(request=request, tb=tb))
 
 
 @router.get("/pl")
 def pl_page(request: Request):
     pl = profit_and_loss()
-    return templates.TemplateResponse("finance_pl.html", {"request": request, "pl": pl})
+    return HTMLResponse(_TPL_FINANCE_PL.render(request=request, pl=pl))
 
 
 @router.get("/balance-sheet")
 def bs_page(request: Request):
     bs = balance_sheet()
-    return templates.TemplateResponse("finance_balance_sheet.html", {"request": request, "bs": bs})
\ No newline at end of file
+    return HTMLResponse(_TPL_FINANCE_BALANCE_SHEET.render(request=request, bs=bs))
\ No newline at end of file
@@ -3,19 +3,32 @@ from __future__ import annotations
 from fastapi import APIRouter, Request, Form
 import uuid
 from fastapi.responses import HTMLResponse, RedirectResponse
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from ..templating import templates_env
+from .. import jsonio
 from pathlib import Path
 from datetime import datetime
-import json
+from types import MappingProxyType
 
 
-templates_env = Environment(
-    loader=FileSystemLoader("backend/templates"),
-    autoescape=select_autoescape(["html", "xml"]),
-)
+_TPL_HR_PAYROLL = templates_env.get_template("hr_payroll.html")
+_TPL_HR_RECRUITMENT = templates_env.get_template("hr_recruitment.html")
+_TPL_HR_PAYROLL_RUN = templates_env.get_template("hr_payroll_run.html")
+_TPL_HR_PAYROLL_RUNS = templates_env.get_template("hr_payroll_runs.html")
+_TPL_HR_PAYROLL_RUN_DETAIL = templates_env.get_template("hr_payroll_run_detail.html")
+_TPL_HR_RECRUITMENT_NEW = templates_env.get_template("hr_recruitment_new.html")
+_TPL_HR_JOBS = templates_env.get_template("hr_jobs.html")
+_TPL_HR_JOB_DETAIL = templates_env.get_template("hr_job_detail.html")
 
 router = APIRouter(prefix="/hr", tags=["Human Resources"]) 
 
+# App header shared by every HR page; read-only, so one instance serves all requests
+HR_APP_ITEM = MappingProxyType({
+    "name": "Human Resources",
+    "slug": "hr",
+    "color": "#4a90e2",
+    "description": "People, payroll, attendance, leave",
+})
+
 # --- Simple JSON persistence ---
 DATA_DIR = Path("backend/data")
 DATA_DIR.mkdir(parents=True, exist_ok=True)
@@ -27,55 +40,35 @@ def _load_json(path: Path):
     if not path.exists():
         return []
     try:
-        with path.open("r", encoding="utf-8") as f:
-            return json.load(f)
+        return jsonio.loads(path.read_bytes())
     except Exception:
         return []
 
 
 def _save_json(path: Path, data):
-    with path.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    jsonio.write_atomic(path, jsonio.dumps(data))
 
 
 @router.get("/payroll", response_class=HTMLResponse)
 async def payroll_page(request: Request):
-    tpl = templates_env.get_template("hr_payroll.html")
-    app_item = {
-        "name": "Human Resources",
-        "slug": "hr",
-        "color": "#4a90e2",
-        "description": "People, payroll, attendance, leave",
-    }
+    tpl = _TPL_HR_PAYROLL
     runs = _load_json(PAYROLL_RUNS_FILE)
-    recent_runs = list(reversed(runs))[:5]
-    return HTMLResponse(tpl.render(request=request, app_item=app_item, recent_runs=recent_runs))
+    recent_runs = runs[-5:][::-1]
+    return HTMLResponse(tpl.render(request=request, app_item=HR_APP_ITEM, recent_runs=recent_runs))
 
 
 @router.get("/recruitment", response_class=HTMLResponse)
 async def recruitment_page(request: Request):
-    tpl = templates_env.get_template("hr_recruitment.html")
-    app_item = {
-        "name": "Human Resources",
-        "slug": "hr",
-        "color": "#4a90e2",
-        "description": "People, payroll, attendance, leave",
-    }
+    tpl = _TPL_HR_RECRUITMENT
     jobs = _load_json(JOBS_FILE)
-    recent_jobs = list(reversed(jobs))[:5]
-    return HTMLResponse(tpl.render(request=request, app_item=app_item, recent_jobs=recent_jobs))
+    recent_jobs = jobs[-5:][::-1]
+    return HTMLResponse(tpl.render(request=request, app_item=HR_APP_ITEM, recent_jobs=recent_jobs))
 
 
 @router.get("/payroll/run", response_class=HTMLResponse)
 async def payroll_run(request: Request):
-    tpl = templates_env.get_template("hr_payroll_run.html")
-    app_item = {
-        "name": "Human Resources",
-        "slug": "hr",
-        "color": "#4a90e2",
-        "description": "People, payroll, attendance, leave",
-    }
-    return HTMLResponse(tpl.render(request=request, app_item=app_item))
+    tpl = _TPL_HR_PAYROLL_RUN
+    return HTMLResponse(tpl.render(request=request, app_item=HR_APP_ITEM))
 
 
 @router.post("/payroll/run")
@@ -99,56 +92,32 @@ async def payroll_run_submit(
 @router.get("/payroll/runs", response_class=HTMLResponse)
 async def payroll_runs_list(request: Request):
     runs = _load_json(PAYROLL_RUNS_FILE)
-    tpl = templates_env.get_template("hr_payroll_runs.html")
-    app_item = {
-        "name": "Human Resources",
-        "slug": "hr",
-        "color": "#4a90e2",
-        "description": "People, payroll, attendance, leave",
-    }
-    return HTMLResponse(tpl.render(request=request, app_item=app_item, runs=runs))
+    tpl = _TPL_HR_PAYROLL_RUNS
+    return HTMLResponse(tpl.render(request=request, app_item=HR_APP_ITEM, runs=runs))
 
 
 @router.get("/payroll/run/{index}", response_class=HTMLResponse)
 async def payroll_run_detail(request: Request, index: int):
     runs = _load_json(PAYROLL_RUNS_FILE)
     item = runs[index] if 0 <= index < len(runs) else None
-    tpl = templates_env.get_template("hr_payroll_run_detail.html")
-    app_item = {
-        "name": "Human Resources",
-        "slug": "hr",
-        "color": "#4a90e2",
-        "description": "People, payroll, attendance, leave",
-    }
+    tpl = _TPL_HR_PAYROLL_RUN_DETAIL
     status = 200 if item is not None else 404
-    return HTMLResponse(tpl.render(request=request, app_item=app_item, item=item, index=index), status_code=status)
+    return HTMLResponse(tpl.render(request=request, app_item=HR_APP_ITEM, item=item, index=index), status_code=status)
 
 
 @router.get("/payroll/run/id/{run_id}", response_class=HTMLResponse)
 async def payroll_run_detail_by_id(request: Request, run_id: str):
     runs = _load_json(PAYROLL_RUNS_FILE)
     item = next((r for r in runs if r.get("id") == run_id), None)
-    tpl = templates_env.get_template("hr_payroll_run_detail.html")
-    app_item = {
-        "name": "Human Resources",
-        "slug": "hr",
-        "color": "#4a90e2",
-        "description": "People, payroll, attendance, leave",
-    }
+    tpl = _TPL_HR_PAYROLL_RUN_DETAIL
     status = 200 if item is not None else 404
-    return HTMLResponse(tpl.render(request=request, app_item=app_item, item=item, index=None), status_code=status)
+    return HTMLResponse(tpl.render(request=request, app_item=HR_APP_ITEM, item=item, index=None), status_code=status)
 
 
 @router.get("/recruitment/new", response_class=HTMLResponse)
 async def recruitment_new(request: Request):
-    tpl = templates_env.get_template("hr_recruitment_new.html")
-    app_item = {
-        "name": "Human Resources",
-        "slug": "hr",
-        "color": "#4a90e2",
-        "description": "People, payroll, attendance, leave",
-    }
-    return HTMLResponse(tpl.render(request=request, app_item=app_item))
+    tpl = _TPL_HR_RECRUITMENT_NEW
+    return HTMLResponse(tpl.render(request=request, app_item=HR_APP_ITEM))
 
 
 @router.post("/jobs")
@@ -175,41 +144,23 @@ async def recruitment_job_create(
 @router.get("/jobs", response_class=HTMLResponse)
 async def jobs_list(request: Request):
     jobs = _load_json(JOBS_FILE)
-    tpl = templates_env.get_template("hr_jobs.html")
-    app_item = {
-        "name": "Human Resources",
-        "slug": "hr",
-        "color": "#4a90e2",
-        "description": "People, payroll, attendance, leave",
-    }
-    return HTMLResponse(tpl.render(request=request, app_item=app_item, jobs=jobs))
+    tpl = _TPL_HR_JOBS
+    return HTMLResponse(tpl.render(request=request, app_item=HR_APP_ITEM, jobs=jobs))
 
 
 @router.get("/jobs/{index}", response_class=HTMLResponse)
 async def job_detail(request: Request, index: int):
     jobs = _load_json(JOBS_FILE)
     item = jobs[index] if 0 <= index < len(jobs) else None
-    tpl = templates_env.get_template("hr_job_detail.html")
-    app_item = {
-        "name": "Human Resources",
-        "slug": "hr",
-        "color": "#4a90e2",
-        "description": "People, payroll, attendance, leave",
-    }
+    tpl = _TPL_HR_JOB_DETAIL
     status = 200 if item is not None else 404
-    return HTMLResponse(tpl.render(request=request, app_item=app_item, item=item, index=index), status_code=status)
+    return HTMLResponse(tpl.render(request=request, app_item=HR_APP_ITEM, item=item, index=index), status_code=status)
 
 
 @router.get("/jobs/id/{job_id}", response_class=HTMLResponse)
 async def job_detail_by_id(request: Request, job_id: str):
     jobs = _load_json(JOBS_FILE)
     item = next((j for j in jobs if j.get("id") == job_id), None)
-    tpl = templates_env.get_template("hr_job_detail.html")
-    app_item = {
-        "name": "Human Resources",
-        "slug": "hr",
-        "color": "#4a90e2",
-        "description": "People, payroll, attendance, leave",
-    }
+    tpl = _TPL_HR_JOB_DETAIL
     status = 200 if item is not None else 404
-    return HTMLResponse(tpl.render(request=request, app_item=app_item, item=item, index=None), status_code=status)
\ No newline at end of file
+    return HTMLResponse(tpl.render(request=request, app_item=HR_APP_ITEM, item=item, index=None), status_code=status)
\ No newline at end of file
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-import json
+import threading
 from pathlib import Path
 from datetime import datetime
 from uuid import uuid4
@@ -8,7 +8,8 @@ from uuid import uuid4
 from fastapi import APIRouter, Request, Form
 from fastapi.responses import HTMLResponse, Response
 from starlette.responses import RedirectResponse
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from ..templating import templates_env
+from .. import jsonio
 try:
     # Optional DB-backed products for dropdowns
     from ..db import SessionLocal, Product
@@ -17,11 +18,14 @@ except Exception:
     Product = None
 
 
-# Jinja environment for Inventory templates
-templates_env = Environment(
-    loader=FileSystemLoader("backend/templates"),
-    autoescape=select_autoescape(["html", "xml"]),
-)
+_TPL_INVENTORY_ITEMS = templates_env.get_template("inventory_items.html")
+_TPL_INVENTORY_MOVES_PRINT = templates_env.get_template("inventory_moves_print.html")
+_TPL_INVENTORY_MOVES = templates_env.get_template("inventory_moves.html")
+_TPL_INVENTORY_RECEIVE_NEW = templates_env.get_template("inventory_receive_new.html")
+_TPL_INVENTORY_ISSUE_NEW = templates_env.get_template("inventory_issue_new.html")
+_TPL_INVENTORY_TRANSFERS = templates_env.get_template("inventory_transfers.html")
+_TPL_INVENTORY_TRANSFER_DETAIL = templates_env.get_template("inventory_transfer_detail.html")
+_TPL_INVENTORY_TRANSFER_NEW = templates_env.get_template("inventory_transfer_new.html")
 
 
 # Simple JSON storage for Inventory
@@ -38,13 +42,53 @@ for f in [WAREHOUSES_FILE, LOCATIONS_FILE, STOCK_TRANSFERS_FILE]:
         f.write_text("[]", encoding="utf-8")
 
 
-def _load_json(path: Path) -> list[dict]:
-    if not path.exists():
-        return []
+# Parsed JSON files, keyed on each file's (mtime_ns, size) so a write by another
+# worker process is picked up on the next read. The cached lists are shared between
+# requests: don't mutate them, save a new list instead.
+_cache: dict[Path, tuple[tuple[int, int], list[dict]]] = {}
+_cache_lock = threading.Lock()
+
+
+def _file_key(path: Path) -> tuple[int, int] | None:
     try:
-        return json.loads(path.read_text(encoding="utf-8"))
-    except Exception:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _load_json(path: Path) -> list[dict]:
+    key = _file_key(path)
+    if key is None:
         return []
+    with _cache_lock:
+        hit = _cache.get(path)
+        if hit is not None and hit[0] == key:
+            return hit[1]
+        try:
+            data = jsonio.loads(path.read_bytes())
+        except Exception:
+            data = []
+        _cache[path] = (key, data)
+        return data
+
+
+def _save_json(path: Path, data: list[dict]) -> None:
+    with _cache_lock:
+        try:
+            jsonio.write_atomic(path, jsonio.dumps(data))
+        except Exception:
+            _cache.pop(path, None)  # the file may no longer match the cached list
+            raise
+        key = _file_key(path)
+        if key is not None:
+            _cache[path] = (key, data)
+        else:
+            _cache.pop(path, None)
+
+
+# Keeps concurrent read-modify-write cycles on the JSON stores from interleaving
+_write_lock = threading.Lock()
 
 
 def load_moves() -> list[dict]:
@@ -52,7 +96,7 @@ def load_moves() -> list[dict]:
 
 
 def save_moves(moves: list[dict]) -> None:
-    STOCK_MOVES_FILE.write_text(json.dumps(moves, ensure_ascii=False, indent=2), encoding="utf-8")
+    _save_json(STOCK_MOVES_FILE, moves)
 
 
 def load_warehouses() -> list[dict]:
@@ -68,7 +112,7 @@ def load_transfers() -> list[dict]:
 
 
 def save_transfers(transfers: list[dict]) -> None:
-    STOCK_TRANSFERS_FILE.write_text(json.dumps(transfers, ensure_ascii=False, indent=2), encoding="utf-8")
+    _save_json(STOCK_TRANSFERS_FILE, transfers)
 
 
 def load_products() -> list[dict]:
@@ -97,69 +141,95 @@ def record_move(product: str, quantity: float, unit_cost: float, mtype: str, ref
         "warehouse": warehouse,
         "location": location,
     }
-    moves = load_moves()
-    moves.append(move)
-    save_moves(moves)
+    with _write_lock:
+        previous = load_moves()
+        moves = previous + [move]
+        save_moves(moves)
+        _extend_on_hand(previous, moves, move)
     return move
 
 
-def compute_on_hand() -> dict[str, dict]:
-    """Compute on-hand qty and average cost per product."""
-    moves = load_moves()
+# Unrounded {product: [qty, value]} per (warehouse, location) filter, for the moves
+# list they were summed from. Adding a move to the totals in file order gives the
+# same floats as a full replay, so record_move extends them instead of dropping them.
+_on_hand_cache: tuple[list[dict], dict[tuple, dict[str, list[float]]]] | None = None
+_on_hand_lock = threading.Lock()
+# Filters are request parameters; bound how many are kept per moves version
+_ON_HAND_MAX_FILTERS = 64
+
+
+def _add_move(totals: dict[str, list[float]], m: dict) -> None:
+    p = m.get("product")
+    qty = float(m.get("quantity", 0) or 0)
+    cost = float(m.get("unit_cost", 0) or 0)
+    t = totals.get(p)
+    if t is None:
+        t = totals[p] = [0.0, 0.0]
+    if m.get("type") == "in":
+        t[0] += qty
+        t[1] += qty * cost
+    elif m.get("type") == "out":
+        # For outs, reduce qty and value by the recorded cost
+        t[0] -= qty
+        t[1] -= qty * cost
+
+
+def _site_matches(m: dict, warehouse: str | None, location: str | None) -> bool:
+    return (warehouse is None or m.get("warehouse") == warehouse) and (location is None or m.get("location") == location)
+
+
+def _on_hand_summary(totals: dict[str, list[float]]) -> dict[str, dict]:
     summary: dict[str, dict] = {}
-    for m in moves:
-        p = m.get("product")
-        qty = float(m.get("quantity", 0) or 0)
-        cost = float(m.get("unit_cost", 0) or 0)
-        if p not in summary:
-            summary[p] = {"qty": 0.0, "value": 0.0}
-        if m.get("type") == "in":
-            summary[p]["qty"] += qty
-            summary[p]["value"] += qty * cost
-        elif m.get("type") == "out":
-            # For outs, reduce qty and value by the recorded cost
-            summary[p]["qty"] -= qty
-            summary[p]["value"] -= qty * cost
-    for p, s in summary.items():
-        qty = s["qty"]
-        value = s["value"]
+    for p, (qty, value) in totals.items():
         avg = (value / qty) if qty else 0.0
-        s["avg_cost"] = round(avg, 2)
-        s["qty"] = round(qty, 2)
-        s["value"] = round(value, 2)
+        summary[p] = {"qty": round(qty, 2), "value": round(value, 2), "avg_cost": round(avg, 2)}
     return summary
 
 
+def _on_hand(warehouse: str | None, location: str | None) -> dict[str, dict]:
+    global _on_hand_cache
+    moves = load_moves()
+    with _on_hand_lock:
+        if _on_hand_cache is None or _on_hand_cache[0] is not moves:
+            _on_hand_cache = (moves, {})
+        by_filter = _on_hand_cache[1]
+        totals = by_filter.get((warehouse, location))
+        if totals is None:
+            totals = {}
+            for m in moves:
+                if _site_matches(m, warehouse, location):
+                    _add_move(totals, m)
+            if len(by_filter) >= _ON_HAND_MAX_FILTERS:
+                by_filter.clear()
+            by_filter[(warehouse, location)] = totals
+        # Round while holding the lock, so a concurrent record_move cannot change the
+        # totals mid-iteration or between a product's qty and value
+        return _on_hand_summary(totals)
+
+
+def _extend_on_hand(previous: list[dict], moves: list[dict], move: dict) -> None:
+    """Carry the totals built from previous over to moves, which is previous plus move."""
+    global _on_hand_cache
+    with _on_hand_lock:
+        if _on_hand_cache is None or _on_hand_cache[0] is not previous:
+            return
+        by_filter = _on_hand_cache[1]
+        for (warehouse, location), totals in by_filter.items():
+            if _site_matches(move, warehouse, location):
+                _add_move(totals, move)
+        _on_hand_cache = (moves, by_filter)
+
+
+def compute_on_hand() -> dict[str, dict]:
+    """Compute on-hand qty and average cost per product."""
+    return _on_hand(None, None)
+
+
 def compute_on_hand_site(warehouse: str | None = None, location: str | None = None) -> dict[str, dict]:
     """Compute on-hand and average cost per product filtered by warehouse/location.
     If neither filter is provided, falls back to global aggregation.
     """
-    moves = load_moves()
-    summary: dict[str, dict] = {}
-    for m in moves:
-        if warehouse is not None and m.get("warehouse") != warehouse:
-            continue
-        if location is not None and m.get("location") != location:
-            continue
-        p = m.get("product")
-        qty = float(m.get("quantity", 0) or 0)
-        cost = float(m.get("unit_cost", 0) or 0)
-        if p not in summary:
-            summary[p] = {"qty": 0.0, "value": 0.0}
-        if m.get("type") == "in":
-            summary[p]["qty"] += qty
-            summary[p]["value"] += qty * cost
-        elif m.get("type") == "out":
-            summary[p]["qty"] -= qty
-            summary[p]["value"] -= qty * cost
-    for p, s in summary.items():
-        qty = s["qty"]
-        value = s["value"]
-        avg = (value / qty) if qty else 0.0
-        s["avg_cost"] = round(avg, 2)
-        s["qty"] = round(qty, 2)
-        s["value"] = round(value, 2)
-    return summary
+    return _on_hand(warehouse, location)
 
 
 def get_avg_cost(product: str, warehouse: str | None = None, location: str | None = None) -> float:
@@ -181,8 +251,7 @@ def record_transfer(product: str, quantity: float, from_wh: str, from_loc: str,
     ref = f"XFER-{transfer_id}"
     record_move(product=product, quantity=quantity, unit_cost=avg_cost, mtype="out", ref=ref, memo=memo, warehouse=from_wh, location=from_loc)
     record_move(product=product, quantity=quantity, unit_cost=avg_cost, mtype="in", ref=ref, memo=memo, warehouse=to_wh, location=to_loc)
-    transfers = load_transfers()
-    transfers.append({
+    transfer = {
         "id": transfer_id,
         "date": datetime.utcnow().isoformat(timespec="seconds") + "Z",
         "product": product,
@@ -192,8 +261,9 @@ def record_transfer(product: str, quantity: float, from_wh: str, from_loc: str,
         "to_warehouse": to_wh,
         "to_location": to_loc,
         "unit_cost": avg_cost,
-    })
-    save_transfers(transfers)
+    }
+    with _write_lock:
+        save_transfers(load_transfers() + [transfer])
     return {"id": transfer_id}
 
 
@@ -214,6 +284,17 @@ def record_sales_delivery(delivery: dict):
         record_move(product=p, quantity=qty, unit_cost=avg_cost, mtype="out", ref=f"DEL-{delivery.get('id')}")
 
 
+def _move_datetime(m: dict) -> datetime | None:
+    try:
+        dstr = str(m.get("date", ""))
+        # support Z suffix
+        if dstr.endswith("Z"):
+            dstr = dstr[:-1]
+        return datetime.fromisoformat(dstr)
+    except Exception:
+        return None
+
+
 router = APIRouter(prefix="/inventory", tags=["Inventory"])
 
 
@@ -235,7 +316,7 @@ async def items_list(request: Request, warehouse: str | None = None, location: s
     ]
     warehouses = load_warehouses()
     locations = load_locations()
-    tpl = templates_env.get_template("inventory_items.html")
+    tpl = _TPL_INVENTORY_ITEMS
     return HTMLResponse(tpl.render(request=request, items=items, warehouses=warehouses, locations=locations, selected_warehouse=warehouse or "", selected_location=location or ""))
 
 
@@ -255,19 +336,6 @@ async def moves_list(
     per_page: int = 50,
     format: str | None = None,
 ):
-    moves = load_moves()
-    # Filters
-    if ref:
-        moves = [m for m in moves if str(m.get("ref", "")) == ref]
-    if warehouse:
-        moves = [m for m in moves if m.get("warehouse") == warehouse]
-    if location:
-        moves = [m for m in moves if m.get("location") == location]
-    if type in {"in", "out"}:
-        moves = [m for m in moves if m.get("type") == type]
-    if memo:
-        q = memo.lower()
-        moves = [m for m in moves if q in str(m.get("memo", "")).lower()]
     # Date range filter (expects YYYY-MM-DD)
     def _to_date(val: str | None):
         if not val:
@@ -278,49 +346,62 @@ async def moves_list(
             return None
     sd = _to_date(start_date)
     ed = _to_date(end_date)
-    if sd or ed:
-        filtered: list[dict] = []
-        for m in moves:
-            md = None
-            try:
-                dstr = str(m.get("date", ""))
-                # support Z suffix
-                if dstr.endswith("Z"):
-                    dstr = dstr[:-1]
-                md = datetime.fromisoformat(dstr).date()
-            except Exception:
-                md = None
-            if md is None:
-                continue
-            if sd and md < sd:
-                continue
-            if ed and md > ed:
-                continue
-            filtered.append(m)
-        moves = filtered
+    memo_q = memo.lower() if memo else ""
+    mtype = type if type in {"in", "out"} else None
+    sort_by_date = sort == "date"
+
+    # Filters, applied together in one pass; each move's date is parsed at most
+    # once and kept for the date sort
+    moves: list[dict] = []
+    move_dates: dict[int, datetime] = {}  # id(move) -> parsed date
+    for m in load_moves():
+        if ref and str(m.get("ref", "")) != ref:
+            continue
+        if warehouse and m.get("warehouse") != warehouse:
+            continue
+        if location and m.get("location") != location:
+            continue
+        if mtype and m.get("type") != mtype:
+            continue
+        if memo_q and memo_q not in str(m.get("memo", "")).lower():
+            continue
+        if sd or ed or sort_by_date:
+            dt = _move_datetime(m)
+            if sd or ed:
+                if dt is None:
+                    continue
+                md = dt.date()
+                if sd and md < sd:
+                    continue
+                if ed and md > ed:
+                    continue
+            if sort_by_date:
+                move_dates[id(m)] = dt or datetime.min
+        moves.append(m)
 
     # Sorting (date, product, type)
     allowed_sorts = {"date", "product", "type"}
     if sort in allowed_sorts:
         reverse = (order or "asc").lower() == "desc"
-        if sort == "date":
-            def _parse_dt(m):
-                try:
-                    dstr = str(m.get("date", ""))
-                    if dstr.endswith("Z"):
-                        dstr = dstr[:-1]
-                    return datetime.fromisoformat(dstr)
-                except Exception:
-                    return datetime.min
-            moves = sorted(moves, key=_parse_dt, reverse=reverse)
+        if sort_by_date:
+            moves = sorted(moves, key=lambda m: move_dates[id(m)], reverse=reverse)
         else:
             moves = sorted(moves, key=lambda m: str(m.get(sort, "")), reverse=reverse)
 
-    # Summary totals over filtered set
-    total_qty_in = sum(float(m.get("quantity", 0) or 0) for m in moves if m.get("type") == "in")
-    total_qty_out = sum(float(m.get("quantity", 0) or 0) for m in moves if m.get("type") == "out")
-    total_val_in = sum(float(m.get("quantity", 0) or 0) * float(m.get("unit_cost", 0) or 0) for m in moves if m.get("type") == "in")
-    total_val_out = sum(float(m.get("quantity", 0) or 0) * float(m.get("unit_cost", 0) or 0) for m in moves if m.get("type") == "out")
+    # Summary totals over filtered set, in one pass
+    total_qty_in = total_qty_out = total_val_in = total_val_out = 0.0
+    for m in moves:
+        kind = m.get("type")
+        if kind != "in" and kind != "out":
+            continue
+        qty = float(m.get("quantity", 0) or 0)
+        val = qty * float(m.get("unit_cost", 0) or 0)
+        if kind == "in":
+            total_qty_in += qty
+            total_val_in += val
+        else:
+            total_qty_out += qty
+            total_val_out += val
     totals = {
         "qty_in": total_qty_in,
         "qty_out": total_qty_out,
@@ -370,13 +451,13 @@ async def moves_list(
 
     # JSON export (filtered, non-paged)
     if (format or "").lower() == "json":
-        return Response(content=json.dumps(moves, ensure_ascii=False, indent=2), media_type="application/json")
+        return Response(content=jsonio.dumps(moves), media_type="application/json")
 
     # Print-friendly view (filtered, non-paged)
     if (format or "").lower() == "print":
         warehouses = load_warehouses()
         locations = load_locations()
-        tpl = templates_env.get_template("inventory_moves_print.html")
+        tpl = _TPL_INVENTORY_MOVES_PRINT
         return HTMLResponse(
             tpl.render(
                 request=request,
@@ -398,7 +479,7 @@ async def moves_list(
 
     warehouses = load_warehouses()
     locations = load_locations()
-    tpl = templates_env.get_template("inventory_moves.html")
+    tpl = _TPL_INVENTORY_MOVES
     return HTMLResponse(
         tpl.render(
             request=request,
@@ -428,7 +509,7 @@ async def receive_form(request: Request):
     warehouses = load_warehouses()
     locations = load_locations()
     products = load_products()
-    tpl = templates_env.get_template("inventory_receive_new.html")
+    tpl = _TPL_INVENTORY_RECEIVE_NEW
     return HTMLResponse(tpl.render(request=request, warehouses=warehouses, locations=locations, products=products))
 
 
@@ -443,7 +524,7 @@ async def issue_form(request: Request):
     warehouses = load_warehouses()
     locations = load_locations()
     products = load_products()
-    tpl = templates_env.get_template("inventory_issue_new.html")
+    tpl = _TPL_INVENTORY_ISSUE_NEW
     return HTMLResponse(tpl.render(request=request, warehouses=warehouses, locations=locations, products=products))
 
 
@@ -458,7 +539,7 @@ async def issue_create(product: str = Form(...), quantity: float = Form(...), wa
 @router.get("/transfers", response_class=HTMLResponse)
 async def transfers_list(request: Request):
     transfers = load_transfers()
-    tpl = templates_env.get_template("inventory_transfers.html")
+    tpl = _TPL_INVENTORY_TRANSFERS
     return HTMLResponse(tpl.render(request=request, transfers=transfers))
 
 
@@ -474,7 +555,7 @@ async def transfer_detail(request: Request, transfer_id: str):
     ref = f"XFER-{transfer_id}"
     moves = [m for m in load_moves() if m.get("ref") == ref]
 
-    tpl = templates_env.get_template("inventory_transfer_detail.html")
+    tpl = _TPL_INVENTORY_TRANSFER_DETAIL
     return HTMLResponse(tpl.render(request=request, transfer=transfer, moves=moves))
 
 
@@ -483,7 +564,7 @@ async def transfers_new(request: Request):
     warehouses = load_warehouses()
     locations = load_locations()
     products = load_products()
-    tpl = templates_env.get_template("inventory_transfer_new.html")
+    tpl = _TPL_INVENTORY_TRANSFER_NEW
     return HTMLResponse(tpl.render(request=request, warehouses=warehouses, locations=locations, products=products))
 
 
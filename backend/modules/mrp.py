@@ -8,7 +8,7 @@ from typing import Dict, List, Tuple, Set
 from fastapi import APIRouter, Request, Form
 from fastapi.responses import HTMLResponse
 from starlette.responses import RedirectResponse
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from ..templating import templates_env
 
 # Reuse existing loaders and helpers from modules
 from .sales import load_orders as load_sales_orders, load_deliveries
@@ -21,12 +21,6 @@ from .production import (
 from .inventory import compute_on_hand, compute_on_hand_site
 
 
-templates_env = Environment(
-    loader=FileSystemLoader("backend/templates"),
-    autoescape=select_autoescape(["html", "xml"]),
-)
-
-
 router = APIRouter(prefix="/mrp", tags=["MRP"])
 
 # Simple default lead times in days (fallbacks; overridden by company settings)
@@ -8,7 +8,7 @@ from uuid import uuid4
 from fastapi import APIRouter, Request, Form
 from fastapi.responses import HTMLResponse
 from starlette.responses import RedirectResponse
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from ..templating import templates_env
 
 # Import inventory helpers for stock moves
 from .inventory import record_move, compute_on_hand, get_avg_cost
@@ -19,12 +19,6 @@ except Exception:
     Product = None
 
 
-templates_env = Environment(
-    loader=FileSystemLoader("backend/templates"),
-    autoescape=select_autoescape(["html", "xml"]),
-)
-
-
 DATA_DIR = Path("backend/data")
 BOMS_FILE = DATA_DIR / "boms.json"
 WORK_ORDERS_FILE = DATA_DIR / "work_orders.json"
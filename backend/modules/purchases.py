@@ -8,20 +8,13 @@ from uuid import uuid4
 from fastapi import APIRouter, Request, HTTPException, Form
 from fastapi.responses import HTMLResponse
 from starlette.responses import RedirectResponse
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from ..templating import templates_env
 from pydantic import BaseModel
 
 from .finance import post_purchase_bill_to_gl, post_purchase_payment_to_gl
 from .inventory import record_purchase_receipt
 
 
-# Jinja environment for Purchases templates
-templates_env = Environment(
-    loader=FileSystemLoader("backend/templates"),
-    autoescape=select_autoescape(["html", "xml"]),
-)
-
-
 # Simple JSON storage for Purchases
 DATA_DIR = Path("backend/data")
 ORDERS_FILE = DATA_DIR / "purchase_orders.json"
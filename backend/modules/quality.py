@@ -8,17 +8,10 @@ from uuid import uuid4
 from fastapi import APIRouter, Request, Form
 from fastapi.responses import HTMLResponse
 from starlette.responses import RedirectResponse
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from ..templating import templates_env
 from urllib.parse import quote
 
 
-# Jinja environment for Quality templates
-templates_env = Environment(
-    loader=FileSystemLoader("backend/templates"),
-    autoescape=select_autoescape(["html", "xml"]),
-)
-
-
 router = APIRouter(prefix="/quality", tags=["Quality Assurance"])
 
 
@@ -9,20 +9,13 @@ from fastapi import APIRouter, Request, HTTPException, Form
 from fastapi.responses import HTMLResponse
 from starlette.responses import RedirectResponse
 from .inventory import record_sales_delivery
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from ..templating import templates_env
 from pydantic import BaseModel
 from ..db import SessionLocal, Customer, default_vat_rate
 from .accounting import append_ar_entry
 from .finance import post_invoice_to_gl, post_payment_to_gl, post_delivery_to_gl
 
 
-# Jinja environment for Sales templates (reuses global templates folder)
-templates_env = Environment(
-    loader=FileSystemLoader("backend/templates"),
-    autoescape=select_autoescape(["html", "xml"]),
-)
-
-
 # Simple JSON storage
 DATA_DIR = Path("backend/data")
 QUOTES_FILE = DATA_DIR / "quotes.json"
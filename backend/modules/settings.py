@@ -2,16 +2,12 @@ from __future__ import annotations
 
 import json
 from pathlib import Path
-from fastapi import APIRouter, Request, Form
-from fastapi.responses import HTMLResponse
-from starlette.responses import RedirectResponse
-from jinja2 import Environment, FileSystemLoader, select_autoescape
-
+from typing import Optional
 
-templates_env = Environment(
-    loader=FileSystemLoader("backend/templates"),
-    autoescape=select_autoescape(["html", "xml"]),
-)
+from fastapi import APIRouter, Depends, Request, Form
+from fastapi.responses import HTMLResponse, Response
+from starlette.responses import RedirectResponse
+from ..templating import templates_env
 
 
 DATA_DIR = Path("backend/data")
@@ -45,7 +41,9 @@ def _save_json(path: Path, data: list[dict]) -> None:
 
 
 router = APIRouter(prefix="/settings", tags=["Settings"])
-from .auth import require_roles
+from .auth import role_guard
+
+_HR_ADMIN = role_guard("admin", "hr")
 
 
 @router.get("/warehouses", response_class=HTMLResponse)
@@ -232,8 +230,7 @@ async def positions_update(pos_id: str, title: str = Form(...), org_unit_id: str
 # Delete endpoints (Org Units)
 # -----------------------------
 @router.get("/org-units/{unit_id}/delete", response_class=HTMLResponse)
-async def org_units_delete_confirm(request: Request, unit_id: str):
-    denied = require_roles(request, ["admin", "hr"])
+async def org_units_delete_confirm(request: Request, unit_id: str, denied: Optional[Response] = Depends(_HR_ADMIN)):
     if denied:
         return denied
     org_units = _load_json(ORG_UNITS_FILE)
@@ -260,8 +257,7 @@ async def org_units_delete_confirm(request: Request, unit_id: str):
 
 
 @router.post("/org-units/{unit_id}/delete")
-async def org_units_delete(request: Request, unit_id: str):
-    denied = require_roles(request, ["admin", "hr"])
+async def org_units_delete(unit_id: str, denied: Optional[Response] = Depends(_HR_ADMIN)):
     if denied:
         return denied
     org_units = _load_json(ORG_UNITS_FILE)
@@ -286,8 +282,7 @@ async def org_units_delete(request: Request, unit_id: str):
 # Delete endpoints (Positions)
 # ---------------------------
 @router.get("/positions/{pos_id}/delete", response_class=HTMLResponse)
-async def positions_delete_confirm(request: Request, pos_id: str):
-    denied = require_roles(request, ["admin", "hr"])
+async def positions_delete_confirm(request: Request, pos_id: str, denied: Optional[Response] = Depends(_HR_ADMIN)):
     if denied:
         return denied
     positions = _load_json(POSITIONS_FILE)
@@ -304,8 +299,7 @@ async def positions_delete_confirm(request: Request, pos_id: str):
 
 
 @router.post("/positions/{pos_id}/delete")
-async def positions_delete(request: Request, pos_id: str):
-    denied = require_roles(request, ["admin", "hr"])
+async def positions_delete(pos_id: str, denied: Optional[Response] = Depends(_HR_ADMIN)):
     if denied:
         return denied
     positions = _load_json(POSITIONS_FILE)
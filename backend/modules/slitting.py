@@ -8,14 +8,7 @@ from typing import List, Dict, Optional
 from fastapi import APIRouter, Request, Form
 from fastapi.responses import HTMLResponse, JSONResponse
 from starlette.responses import RedirectResponse
-from jinja2 import Environment, FileSystemLoader, select_autoescape
-
-
-# Jinja environment for Slitting templates
-templates_env = Environment(
-    loader=FileSystemLoader("backend/templates"),
-    autoescape=select_autoescape(["html", "xml"]),
-)
+from ..templating import templates_env
 
 
 router = APIRouter(prefix="/slitting", tags=["Slitting"])
@@ -8,7 +8,7 @@ from typing import List, Dict
 from fastapi import APIRouter, Request, Form
 from fastapi.responses import HTMLResponse
 from starlette.responses import RedirectResponse
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from ..templating import templates_env
 
 try:
     # For employee dropdowns
@@ -18,11 +18,6 @@ except Exception:
         return []
 
 
-templates_env = Environment(
-    loader=FileSystemLoader("backend/templates"),
-    autoescape=select_autoescape(["html", "xml"]),
-)
-
 router = APIRouter(prefix="/time", tags=["Time Management"])
 
 DATA_DIR = Path("backend/data")
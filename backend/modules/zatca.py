@@ -6,15 +6,10 @@ from pathlib import Path
 from datetime import datetime
 from fastapi import APIRouter
 from fastapi.responses import JSONResponse, HTMLResponse
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from ..templating import templates_env
 from .sales import load_invoices
 
 
-templates_env = Environment(
-    loader=FileSystemLoader("backend/templates"),
-    autoescape=select_autoescape(["html", "xml"]),
-)
-
 router = APIRouter(prefix="/zatca", tags=["ZATCA"])
 
 
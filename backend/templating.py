@@ -0,0 +1,41 @@
+"""Shared Jinja2 environment for all HTML pages."""
+
+from __future__ import annotations
+
+import tempfile
+from pathlib import Path
+
+from fastapi.responses import StreamingResponse
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template, select_autoescape
+
+# Compiled templates are cached on disk so that a fresh process (e.g. a serverless
+# cold start in a warm container) can skip recompiling them from source.
+BYTECODE_CACHE_DIR = Path(tempfile.gettempdir()) / "jinja_cache"
+BYTECODE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+bytecode_cache = FileSystemBytecodeCache(directory=str(BYTECODE_CACHE_DIR))
+
+# One environment (and one compiled-template cache) shared by every module.
+# Templates only change on deploy, so skip the per-render mtime check.
+templates_env = Environment(
+    loader=FileSystemLoader("backend/templates"),
+    autoescape=select_autoescape(["html", "xml"]),
+    auto_reload=False,
+    cache_size=400,
+    bytecode_cache=bytecode_cache,
+)
+
+
+# Rendered chunks are grouped before being written, so a long table goes out in a
+# few dozen writes rather than one per template expression.
+STREAM_BUFFER = 64
+
+
+def stream_template(template: Template, headers: dict[str, str] | None = None, **context) -> StreamingResponse:
+    """Send a page while it renders instead of building the whole body in memory first.
+
+    Errors raised mid-render can no longer become a 500 page, so only use this for
+    templates that render plain data already loaded by the handler.
+    """
+    stream = template.stream(**context)
+    stream.enable_buffering(STREAM_BUFFER)
+    return StreamingResponse(stream, media_type="text/html", headers=headers)